@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*- # Character encoding, recommended
+"""Benchmarks of the software.
+
+Run with python3 -m populse_mia.benchmark.
+
+:Contains:
+    :Function:
+        - bench_fill_table
+        - create_benchmark_project
+        - main
+
+"""
+
+##########################################################################
+# Populse_mia - Copyright (C) IRMaGe/CEA, 2018
+# Distributed under the terms of the CeCILL license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL_V2.1-en.html
+# for details.
+##########################################################################
+
+import shutil
+import sys
+import time
+
+# PyQt5 import
+from PyQt5.QtWidgets import QApplication
+
+# Populse_MIA imports
+from populse_mia.data_manager.project import (COLLECTION_CURRENT,
+                                              COLLECTION_INITIAL, Project,
+                                              TAG_CHECKSUM, TAG_FILENAME,
+                                              TAG_TYPE, TYPE_NII)
+from populse_mia.data_manager.database_mia import TAG_ORIGIN_BUILTIN
+from populse_mia.software_properties import Config
+from populse_mia.user_interface.data_browser.data_browser import (
+    TableDataBrowser)
+
+# Populse_db imports
+from populse_db.database import FIELD_TYPE_FLOAT, FIELD_TYPE_STRING
+
+
+def create_benchmark_project(rows_number):
+    """Create a temporary project filled with fake documents.
+
+    :param rows_number: number of documents of the project
+    :return: the Project object
+    """
+
+    project = Project(None, True)
+    session = project.session
+
+    for collection in (COLLECTION_CURRENT, COLLECTION_INITIAL):
+        session.add_field(collection, "PatientName", FIELD_TYPE_STRING,
+                          "Patient name", True, TAG_ORIGIN_BUILTIN, None, None)
+        session.add_field(collection, "BandWidth", FIELD_TYPE_FLOAT,
+                          "Band width", True, TAG_ORIGIN_BUILTIN, None, None)
+
+    for i in range(rows_number):
+        document = {TAG_FILENAME: "data/raw_data/bench_%06d.nii" % i,
+                    TAG_CHECKSUM: "%032x" % i,
+                    TAG_TYPE: TYPE_NII,
+                    "PatientName": "patient_%d" % (i % 100),
+                    "BandWidth": float(i)}
+        session.add_document(COLLECTION_CURRENT, document, flush=False)
+        session.add_document(COLLECTION_INITIAL, document, flush=False)
+
+    session.commit()
+    return project
+
+
+def bench_fill_table(rows_numbers=(1000, 10000, 50000), budgets=None):
+    """Measure the time needed to fill the data browser table.
+
+    For each number of rows, the table is filled with each time budget of
+    TableDataBrowser.fill_rows_by_chunks. A budget of 0 processes the events
+    after every row.
+
+    :param rows_numbers: numbers of documents of the benchmark projects
+    :param budgets: time budgets (in s) of the chunks, default is 0 and
+       TableDataBrowser.fill_time_budget
+    :return: dictionary {(rows number, budget): fill time in s}
+    """
+
+    default_budget = TableDataBrowser.fill_time_budget
+
+    if budgets is None:
+        budgets = (0, default_budget)
+
+    results = {}
+
+    try:
+
+        for rows_number in rows_numbers:
+            project = create_benchmark_project(rows_number)
+
+            try:
+
+                for budget in budgets:
+                    TableDataBrowser.fill_time_budget = budget
+                    start = time.perf_counter()
+                    table = TableDataBrowser(
+                        project, None, project.session.get_shown_tags(),
+                        True, True, link_viewer=False)
+                    results[(rows_number, budget)] = (time.perf_counter() -
+                                                      start)
+                    table.deleteLater()
+                    print("{0:>6} rows, budget {1:.3f} s: {2:.2f} s".format(
+                        rows_number, budget, results[(rows_number, budget)]))
+
+            finally:
+                config = Config()
+                opened_projects = config.get_opened_projects()
+
+                if project.folder in opened_projects:
+                    opened_projects.remove(project.folder)
+                    config.set_opened_projects(opened_projects)
+
+                project.database.__exit__(None, None, None)
+                shutil.rmtree(project.folder, ignore_errors=True)
+
+    finally:
+        TableDataBrowser.fill_time_budget = default_budget
+
+    return results
+
+
+def main():
+    """Run the benchmarks."""
+
+    app = QApplication.instance()
+
+    if app is None:
+        app = QApplication(sys.argv)
+
+    print("\nData browser table fill:")
+    bench_fill_table()
+
+
+if __name__ == '__main__':
+    main()
@@ -47,14 +47,47 @@ FIELD_ATTRIBUTES_COLLECTION = 'mia_field_attributes'
 class DatabaseSessionMIA(DatabaseSession):
     """Class overriding the database session of populse_db
 
+    The session records the documents and the fields changed by its
+    modification methods, with a revision number increased at each change,
+    so that the views of the database (the data browser table) can be
+    updated with only the changes made since they were last displayed.
+
     .. Methods:
         - add_collection: overrides the method adding a collection
+        - add_document: adds a document and records the change
         - add_field: adds a field to the database, if it does not already exist
         - add_fields: adds the list of fields
+        - add_value: adds a value and records the change
+        - copy_field: copies the values of a field into another field
+        - fill_field: sets the same value of a field for all the documents
+        - get_changes: gives the documents and fields changed since a revision
         - get_shown_tags: gives the list of visible tags
+        - publish_changes: records changed documents and fields
+        - remove_document: removes a document and records the change
+        - remove_documents_bulk: removes several documents
+        - remove_value: removes a value and records the change
+        - rollback: cancels the pending changes and the recorded changes
         - set_shown_tags: sets the list of visible tags
+        - set_value: sets a value and records the change
+        - set_values: sets the values of a document and records the change
+        - set_values_bulk: sets the values of several documents
     """
 
+    def __init__(self, database):
+        """Initialization of the session.
+
+        :param database: Database instance to take into account
+        """
+
+        super(DatabaseSessionMIA, self).__init__(database)
+        self.revision = 0
+        # Revision before which the changes are unknown (after a rollback)
+        self.reset_revision = 0
+        # {collection: {document id or field name: revision of its last
+        # change}}
+        self.changed_documents = {}
+        self.changed_fields = {}
+
     def add_collection(self, name, primary_key, visibility, origin, unit,
                        default_value):
         """Override the method adding a collection of populse_db.
@@ -100,6 +133,22 @@ class DatabaseSessionMIA(DatabaseSession):
                 'default_value',
                 FIELD_TYPE_STRING)
 
+    def add_document(self, collection, document, *args, **kwargs):
+        """Add a document to a collection and record the change.
+
+        :param collection: document collection (str, must be existing)
+        :param document: dictionary of document values, or document
+                         primary key (str)
+        """
+
+        super(DatabaseSessionMIA, self).add_document(collection, document,
+                                                     *args, **kwargs)
+
+        if isinstance(document, dict):
+            document = document[self.engine.primary_key(collection)]
+
+        self.publish_changes(collection, documents=[document])
+
     def add_field(self, collection, name, field_type, description,
                   visibility, origin, unit, default_value,
                   index=False, flush=True):
@@ -123,6 +172,7 @@ class DatabaseSessionMIA(DatabaseSession):
                       default
         """
         super(DatabaseSessionMIA, self).add_field(collection, name, field_type, description)
+        self.publish_changes(collection, fields=[name])
         self.add_document(FIELD_ATTRIBUTES_COLLECTION,
                           {
                               'index': '%s|%s' % (collection, name),
@@ -145,6 +195,22 @@ class DatabaseSessionMIA(DatabaseSession):
             self.add_field(field[0], field[1], field[2], field[3], field[4],
                            field[5], field[6], field[7], False)
 
+    def add_value(self, collection, document_id, field, value, *args,
+                  **kwargs):
+        """Add a value for <collection, document_id, field> and record the
+        change.
+
+        :param collection: document collection (str, must be existing)
+        :param document_id: document name (str, must be existing)
+        :param field: field name (str, must be existing)
+        :param value: value to add
+        """
+
+        super(DatabaseSessionMIA, self).add_value(collection, document_id,
+                                                  field, value, *args,
+                                                  **kwargs)
+        self.publish_changes(collection, documents=[document_id])
+
     def remove_field(self, collection, fields):
         """
         Removes a field in the collection
@@ -160,10 +226,115 @@ class DatabaseSessionMIA(DatabaseSession):
         super(DatabaseSessionMIA, self).remove_field(collection, fields)
         if isinstance(fields, str):
             fields = [fields]
+        self.publish_changes(collection, fields=fields)
         for field in fields:
             self.remove_document(FIELD_ATTRIBUTES_COLLECTION,
                                  '%s|%s' % (collection, field))
 
+    def copy_field(self, collection, source_field, field):
+        """Copy the values of a field into another field, for all the
+        documents of a collection, with one statement per table.
+
+        :param collection: fields collection (str, must be existing)
+        :param source_field: name of the copied field (str, must be existing)
+        :param field: name of the field receiving the values (str, must be
+                      existing and of the same type as source_field)
+        """
+
+        engine = self.engine
+        table = engine.collection_table[collection]
+        source_column = engine.field_column[collection][source_field]
+        column = engine.field_column[collection][field]
+        engine.cursor.execute('UPDATE [%s] SET [%s] = [%s]'
+                              % (table, column, source_column))
+
+        if engine.field_type[collection][field].startswith('list_'):
+            list_table = 'list_%s_%s' % (table, column)
+            engine.cursor.execute('DELETE FROM [%s]' % list_table)
+            engine.cursor.execute(
+                'INSERT INTO [%s] (list_id, i, value) '
+                'SELECT list_id, i, value FROM [list_%s_%s]'
+                % (list_table, table, source_column))
+
+        self.publish_changes(collection, fields=[field])
+
+    def fill_field(self, collection, field, value):
+        """Set the same value of a field for all the documents of a
+        collection, with one statement per table.
+
+        :param collection: field collection (str, must be existing)
+        :param field: field name (str, must be existing)
+        :param value: new value of the field, None removes all the values
+
+        :raise ValueError: If the value is invalid
+        """
+
+        engine = self.engine
+        field_type = engine.field_type[collection][field]
+
+        if not self.check_value_type(value, field_type):
+            raise ValueError("The value {0} is invalid for the type "
+                             "{1}".format(value, field_type))
+
+        table = engine.collection_table[collection]
+        column = engine.field_column[collection][field]
+
+        if field_type.startswith('list_'):
+            list_table = 'list_%s_%s' % (table, column)
+            primary_key = engine.collection_primary_key[collection]
+            pk_column = engine.field_column[collection][primary_key]
+            column_value = engine.list_hash(value)
+            engine.cursor.execute('DELETE FROM [%s]' % list_table)
+            engine.cursor.executemany(
+                'INSERT INTO [%s] (list_id, i, value) SELECT [%s], ?, ? '
+                'FROM [%s]' % (list_table, pk_column, table),
+                [[i, engine.python_to_column(field_type[5:], item)]
+                 for i, item in enumerate(value or [])])
+
+        elif value is None:
+            column_value = None
+
+        else:
+            column_value = engine.python_to_column(field_type, value)
+
+        engine.cursor.execute('UPDATE [%s] SET [%s] = ?' % (table, column),
+                              [column_value])
+        self.publish_changes(collection, fields=[field])
+
+    def get_changes(self, collection, revision):
+        """Give the documents and the fields of a collection changed since a
+        revision.
+
+        The changes of the attributes of the fields (visibility, unit, ...)
+        are given as changed fields.
+
+        :param collection: documents collection (str)
+        :param revision: revision of the session (the revision attribute)
+                         when the changes were last taken into account
+        :return: tuple (set of the changed document ids, set of the changed
+                 field names), or None if the changes are unknown (the
+                 session was rolled back since revision)
+        """
+
+        if revision < self.reset_revision:
+            return None
+
+        documents = {document_id for document_id, document_revision
+                     in self.changed_documents.get(collection, {}).items()
+                     if document_revision > revision}
+        fields = {field for field, field_revision
+                  in self.changed_fields.get(collection, {}).items()
+                  if field_revision > revision}
+        prefix = '%s|' % collection
+
+        for index, index_revision in self.changed_documents.get(
+                FIELD_ATTRIBUTES_COLLECTION, {}).items():
+
+            if index_revision > revision and index.startswith(prefix):
+                fields.add(index[len(prefix):])
+
+        return documents, fields
+
     def get_field(self, collection, name):
         field = super(DatabaseSessionMIA, self).get_field(collection, name)
         if field is not None:
@@ -207,6 +378,172 @@ class DatabaseSessionMIA(DatabaseSession):
             self.set_value(FIELD_ATTRIBUTES_COLLECTION, field.index,
                            'visibility', field.field in fields_shown)
 
+    def publish_changes(self, collection, documents=(), fields=()):
+        """Record documents and fields changed in a collection, with a new
+        revision.
+
+        The methods writing directly in the tables of the engine must call
+        it, the modification methods of the session already do.
+
+        :param collection: documents collection (str)
+        :param documents: ids of the changed (added, modified or removed)
+                          documents
+        :param fields: names of the changed (added, filled or removed) fields
+        """
+
+        self.revision += 1
+
+        if documents:
+            changed_documents = self.changed_documents.setdefault(collection,
+                                                                  {})
+
+            for document_id in documents:
+                changed_documents[document_id] = self.revision
+
+        if fields:
+            changed_fields = self.changed_fields.setdefault(collection, {})
+
+            for field in fields:
+                changed_fields[field] = self.revision
+
+    def remove_document(self, collection, document_id):
+        """Remove a document of a collection and record the change.
+
+        :param collection: document collection (str, must be existing)
+        :param document_id: document name (str, must be existing)
+        """
+
+        super(DatabaseSessionMIA, self).remove_document(collection,
+                                                        document_id)
+        self.publish_changes(collection, documents=[document_id])
+
+    def remove_documents_bulk(self, collection, document_ids):
+        """Remove several documents in a single transaction.
+
+        :param collection: documents collection (str, must be existing)
+        :param document_ids: iterable of the ids of the documents to remove
+                             (must all be existing)
+        """
+
+        for document_id in document_ids:
+            self.remove_document(collection, document_id)
+
+    def remove_value(self, collection, document_id, field, *args, **kwargs):
+        """Remove the value of <collection, document_id, field> and record
+        the change.
+
+        :param collection: document collection (str, must be existing)
+        :param document_id: document name (str, must be existing)
+        :param field: field name (str, must be existing)
+        """
+
+        super(DatabaseSessionMIA, self).remove_value(collection, document_id,
+                                                     field, *args, **kwargs)
+        self.publish_changes(collection, documents=[document_id])
+
+    def rollback(self):
+        """Cancel the pending changes of the database.
+
+        The recorded changes are forgotten: the changes since an older
+        revision are unknown (see get_changes).
+        """
+
+        super(DatabaseSessionMIA, self).rollback()
+        self.revision += 1
+        self.reset_revision = self.revision
+        self.changed_documents.clear()
+        self.changed_fields.clear()
+
+    def set_value(self, collection, document_id, field, new_value, *args,
+                  **kwargs):
+        """Set the value of <collection, document_id, field> and record the
+        change.
+
+        :param collection: document collection (str, must be existing)
+        :param document_id: document name (str, must be existing)
+        :param field: field name (str, must be existing)
+        :param new_value: new value
+        """
+
+        super(DatabaseSessionMIA, self).set_value(collection, document_id,
+                                                  field, new_value, *args,
+                                                  **kwargs)
+        self.publish_changes(collection, documents=[document_id])
+
+    def set_values(self, collection, document_id, values, *args, **kwargs):
+        """Set the values of a document and record the change.
+
+        :param collection: document collection (str, must be existing)
+        :param document_id: document name (str, must be existing)
+        :param values: dictionary {field name: value}
+        """
+
+        super(DatabaseSessionMIA, self).set_values(collection, document_id,
+                                                   values, *args, **kwargs)
+        self.publish_changes(collection, documents=[document_id])
+
+    def set_values_bulk(self, collection, values):
+        """Set the values of several documents, with one statement per field.
+
+        :param collection: documents collection (str, must be existing)
+        :param values: dictionary {document id: {field name: value}}, a None
+                       value removes the value of the field (the documents
+                       must all be existing)
+
+        :raise ValueError: If a value is invalid
+        """
+
+        engine = self.engine
+        table = engine.collection_table[collection]
+        primary_key = engine.collection_primary_key[collection]
+        pk_column = engine.field_column[collection][primary_key]
+        fields_values = {}
+
+        for document_id, document_values in values.items():
+
+            for field, value in document_values.items():
+                fields_values.setdefault(field, []).append((document_id,
+                                                            value))
+
+        for field, field_values in fields_values.items():
+            field_type = engine.field_type[collection][field]
+            column = engine.field_column[collection][field]
+
+            for document_id, value in field_values:
+
+                if not self.check_value_type(value, field_type):
+                    raise ValueError("The value {0} is invalid for the type "
+                                     "{1}".format(value, field_type))
+
+            if field_type.startswith('list_'):
+                list_table = 'list_%s_%s' % (table, column)
+                engine.cursor.executemany(
+                    'DELETE FROM [%s] WHERE list_id = ?' % list_table,
+                    [[document_id] for document_id, value in field_values])
+                engine.cursor.executemany(
+                    'INSERT INTO [%s] (list_id, i, value) VALUES (?, ?, ?)'
+                    % list_table,
+                    [[document_id, i,
+                      engine.python_to_column(field_type[5:], item)]
+                     for document_id, value in field_values
+                     for i, item in enumerate(value or [])])
+                column_values = [[engine.list_hash(value), document_id]
+                                 for document_id, value in field_values]
+
+            else:
+                column_values = [[None if value is None
+                                  else engine.python_to_column(field_type,
+                                                               value),
+                                  document_id]
+                                 for document_id, value in field_values]
+
+            engine.cursor.executemany(
+                'UPDATE [%s] SET [%s] = ? WHERE [%s] = ?'
+                % (table, column, pk_column), column_values)
+
+        self.publish_changes(collection, documents=values.keys())
+
+
 class DatabaseMIA(Database):
     """
     Class overriding the default behavior of populse_db
@@ -26,9 +26,9 @@ import glob
 from populse_mia.software_properties import verCmp
 from populse_mia.data_manager.filter import Filter
 from populse_mia.software_properties import Config
-from populse_mia.utils.utils import set_item_data
 from populse_mia.data_manager.database_mia import (
     DatabaseMIA, TAG_ORIGIN_BUILTIN, TAG_ORIGIN_USER)
+from populse_mia.data_manager.undo_journal import UndoJournal
 
 # Populse_db imports
 from populse_db.database import (
@@ -270,8 +270,12 @@ class Project():
         self.properties = self.loadProperties()
 
         self._unsavedModifications = False
-        self.undos = []
-        self.redos = []
+        # Undo and redo journals, spilling to the database folder
+        memory_cap = config.get_max_undo_memory() * 1024 * 1024
+        self.undos = UndoJournal(os.path.join(db_folder, 'undos_journal.db'),
+                                 memory_cap)
+        self.redos = UndoJournal(os.path.join(db_folder, 'redos_journal.db'),
+                                 memory_cap)
         self.init_filters()
 
     def add_clinical_tags(self):
@@ -444,11 +448,9 @@ class Project():
             - remove_tags
             - add_scans
             - modified_values
+            - modified_values_bulk
             - modified_visibilities
         """
-        # To avoid circular imports
-        from populse_mia.user_interface.data_browser.data_browser import (
-            not_defined_value)
 
         # We can redo if we have an action to make again
         if len(self.redos) > 0:
@@ -469,7 +471,9 @@ class Project():
                 tag_unit = to_redo[3]
                 tag_default_value = to_redo[4]
                 tag_description = to_redo[5]
-                values = to_redo[6]  # List of values stored
+                # How the column is filled: ["value", value] for a default
+                # value, ["tag", tag name] for the values of a cloned tag
+                fill_type, fill_value = to_redo[6]
                 # Adding the tag
                 self.session.add_field(
                     COLLECTION_CURRENT, tag_to_add, tag_type,
@@ -479,12 +483,17 @@ class Project():
                     COLLECTION_INITIAL, tag_to_add, tag_type,
                     tag_description, True, TAG_ORIGIN_USER, tag_unit,
                     tag_default_value)
-                # Adding all the values associated
-                for value in values:
-                    self.session.add_value(
-                        COLLECTION_CURRENT, value[0], value[1], value[2])
-                    self.session.add_value(
-                        COLLECTION_INITIAL, value[0], value[1], value[3])
+                # Filling the column
+                for collection in (COLLECTION_CURRENT, COLLECTION_INITIAL):
+
+                    if fill_type == "tag":
+                        self.session.copy_field(collection, fill_value,
+                                                tag_to_add)
+
+                    else:
+                        self.session.fill_field(collection, tag_to_add,
+                                                fill_value)
+
                 column = table.get_index_insertion(tag_to_add)
                 table.add_column(column, tag_to_add)
 
@@ -509,23 +518,13 @@ class Project():
                 # The second element is a list of the scans to add
                 scans_added = to_redo[1]
                 # We add all the scans
-                for i in range(0, len(scans_added)):
-                    # We remove each scan added
-                    scan_to_add = scans_added[i]
+                for scan_to_add in scans_added:
                     self.session.add_document(COLLECTION_CURRENT, scan_to_add)
                     self.session.add_document(COLLECTION_INITIAL, scan_to_add)
                     table.scans_to_visualize.append(scan_to_add)
                 # We add all the values
                 # The third element is a list of the values to add
-                values_added = to_redo[2]
-                for i in range(0, len(values_added)):
-                    value_to_add = values_added[i]
-                    self.session.add_value(
-                        COLLECTION_CURRENT, value_to_add[0],
-                        value_to_add[1], value_to_add[2])
-                    self.session.add_value(
-                        COLLECTION_INITIAL, value_to_add[0],
-                        value_to_add[1], value_to_add[3])
+                self.reput_values(to_redo[2])
                 table.add_rows(self.session.get_documents_names(
                     COLLECTION_CURRENT))
 
@@ -547,45 +546,35 @@ class Project():
             #         table.update_colors()
             #         table.itemChanged.connect(table.change_cell_color)
 
-            if action == "modified_values":  # Not working
+            if action == "modified_values":
                 # To modify the values, we need the cells,
                 # and the updated values
 
                 # The second element is a list of modified values
-                # (reset or value changed)
-                modified_values = to_redo[1]
+                # (reset or value changed), each modified value is a list
+                # of 4 elements: scan, tag, old value and new value
+                values = {}
+                for scan, tag, old_value, new_value in to_redo[1]:
+                    values.setdefault(scan, {})[tag] = new_value
+                self.session.set_values_bulk(COLLECTION_CURRENT, values)
                 table.itemChanged.disconnect()
-                for i in range(0, len(modified_values)):
-                    # Each modified value is a list of 3 elements:
-                    # scan, tag, and old_value
-                    value_to_restore = modified_values[i]
-                    scan = value_to_restore[0]
-                    tag = value_to_restore[1]
-                    old_value = value_to_restore[2]
-                    new_value = value_to_restore[3]
-
-                    item = table.item(
-                        table.get_scan_row(scan), table.get_tag_column(tag))
-                    if old_value is None:
-                        # Font reput to normal in case it was a not
-                        # defined cell
-                        font = item.font()
-                        font.setItalic(False)
-                        font.setBold(False)
-                        item.setFont(font)
-                    self.session.set_value(
-                        COLLECTION_CURRENT, scan, tag, new_value)
-                    if new_value is None:
-                        font = item.font()
-                        font.setItalic(True)
-                        font.setBold(True)
-                        item.setFont(font)
-                        set_item_data(
-                            item, not_defined_value, FIELD_TYPE_STRING)
-                    else:
-                        set_item_data(
-                            item, new_value, self.session.get_field(
-                                COLLECTION_CURRENT, tag).field_type)
+                table.update_cells(values)
+                table.update_colors()
+                table.itemChanged.connect(table.change_cell_color)
+
+            if action == "modified_values_bulk":
+                # To set the values again, we need the new value of each tag
+                # and the cells of each tag
+                # The second element is a dictionary {tag: new value} and
+                # the third one a dictionary {tag: [[scan, old value], ...]}
+                new_values = to_redo[1]
+                values = {}
+                for tag, old_values in to_redo[2].items():
+                    for scan, old_value in old_values:
+                        values.setdefault(scan, {})[tag] = new_values[tag]
+                self.session.set_values_bulk(COLLECTION_CURRENT, values)
+                table.itemChanged.disconnect()
+                table.update_cells(values)
                 table.update_colors()
                 table.itemChanged.connect(table.change_cell_color)
 
@@ -603,18 +592,22 @@ class Project():
     def reput_values(self, values):
         """Re-put the value objects in the database.
 
-        :param values: List of Value objects
+        The values are set with one bulk update per collection.
+
+        :param values: List of Value objects ([scan, tag, current value,
+                       initial value])
         """
 
-        for i in range(0, len(values)):
+        current_values = {}
+        initial_values = {}
+
+        for scan, tag, current_value, initial_value in values:
             # We reput each value, exactly the same as it was before
-            valueToReput = values[i]
-            self.session.add_value(
-                COLLECTION_CURRENT, valueToReput[0], valueToReput[1],
-                valueToReput[2])
-            self.session.add_value(
-                COLLECTION_INITIAL, valueToReput[0], valueToReput[1],
-                valueToReput[3])
+            current_values.setdefault(scan, {})[tag] = current_value
+            initial_values.setdefault(scan, {})[tag] = initial_value
+
+        self.session.set_values_bulk(COLLECTION_CURRENT, current_values)
+        self.session.set_values_bulk(COLLECTION_INITIAL, initial_values)
 
     def save_current_filter(self, custom_filters):
         """Save the current filter.
@@ -746,6 +739,7 @@ class Project():
             - remove_tags
             - add_scans
             - modified_values
+            - modified_values_bulk
             - modified_visibilities
         """
 
@@ -806,15 +800,11 @@ class Project():
                 # To remove added scans, we just need their file name
                 # The second element is a list of added scans to remove
                 scans_added = to_undo[1]
-                for i in range(0, len(scans_added)):
-                    # We remove each scan added
-                    scan_to_remove = scans_added[i]
-                    self.session.remove_document(
-                        COLLECTION_CURRENT, scan_to_remove)
-                    self.session.remove_document(
-                        COLLECTION_INITIAL, scan_to_remove)
-                    table.removeRow(table.get_scan_row(scan_to_remove))
-                    table.scans_to_visualize.remove(scan_to_remove)
+                self.session.remove_documents_bulk(COLLECTION_CURRENT,
+                                                   scans_added)
+                self.session.remove_documents_bulk(COLLECTION_INITIAL,
+                                                   scans_added)
+                table.remove_rows(scans_added)
                 table.itemChanged.disconnect()
                 table.update_colors()
                 table.itemChanged.connect(table.change_cell_color)
@@ -845,46 +835,35 @@ class Project():
                 # we need two things:
                 # the cell (scan and tag, and the old value)
                 # The second element is a list of modified values (reset,
-                modified_values = to_undo[1]
-                # or value changed)
-                table.itemChanged.disconnect()
-                for i in range(0, len(modified_values)):
-                    # Each modified value is a list of 3 elements:
-                    # scan, tag, and old_value
-                    value_to_restore = modified_values[i]
-                    scan = value_to_restore[0]
-                    tag = value_to_restore[1]
-                    old_value = value_to_restore[2]
-                    new_value = value_to_restore[3]
-                    item = table.item(
-                        table.get_scan_row(scan), table.get_tag_column(tag))
+                # or value changed), each modified value is a list of 4
+                # elements: scan, tag, old value and new value
+                values = {}
+                # If the cell was not defined before, its initial value
+                # is removed too
+                initial_values = {}
+                for scan, tag, old_value, new_value in to_undo[1]:
+                    values.setdefault(scan, {})[tag] = old_value
                     if old_value is None:
-                        # If the cell was not defined before, we reput it
-                        self.session.remove_value(
-                            COLLECTION_CURRENT, scan, tag)
-                        self.session.remove_value(
-                            COLLECTION_INITIAL, scan, tag)
-                        set_item_data(
-                            item, not_defined_value, FIELD_TYPE_STRING)
-                        font = item.font()
-                        font.setItalic(True)
-                        font.setBold(True)
-                        item.setFont(font)
-                    else:
-                        # If the cell was there before,
-                        # we just set it to the old value
-                        self.session.set_value(
-                            COLLECTION_CURRENT, scan, tag, old_value)
-                        set_item_data(
-                            item, old_value, self.session.get_field(
-                                COLLECTION_CURRENT, tag).field_type)
-                        # If the new value is None,
-                        # the not defined font must be removed
-                        if new_value is None:
-                            font = item.font()
-                            font.setItalic(False)
-                            font.setBold(False)
-                            item.setFont(font)
+                        initial_values.setdefault(scan, {})[tag] = None
+                self.session.set_values_bulk(COLLECTION_CURRENT, values)
+                self.session.set_values_bulk(COLLECTION_INITIAL,
+                                             initial_values)
+                table.itemChanged.disconnect()
+                table.update_cells(values)
+                table.update_colors()
+                table.itemChanged.connect(table.change_cell_color)
+            if action == "modified_values_bulk":
+                # To revert a multi-cell edit, we need the old value of each
+                # cell
+                # The third element is a dictionary
+                # {tag: [[scan, old value], ...]}
+                values = {}
+                for tag, old_values in to_undo[2].items():
+                    for scan, old_value in old_values:
+                        values.setdefault(scan, {})[tag] = old_value
+                self.session.set_values_bulk(COLLECTION_CURRENT, values)
+                table.itemChanged.disconnect()
+                table.update_cells(values)
                 table.update_colors()
                 table.itemChanged.connect(table.change_cell_color)
             if action == "modified_visibilities":
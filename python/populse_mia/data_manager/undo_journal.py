@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*- #
+"""Module that contains the journal storing the undo and redo actions of a
+project.
+
+:Contains:
+    :Class:
+        - FieldRecord
+        - JournalRecord
+        - UndoJournal
+
+"""
+
+##########################################################################
+# Populse_mia - Copyright (C) IRMaGe/CEA, 2018
+# Distributed under the terms of the CeCILL license, as published by
+# the CEA-CNRS-INRIA. Refer to the LICENSE file or to
+# http://www.cecill.info/licences/Licence_CeCILL_V2.1-en.html
+# for details.
+##########################################################################
+
+import os
+import pickle
+import sqlite3
+import zlib
+from collections import deque, namedtuple
+
+# Attributes of a field (tag) kept in the history of the remove_tags action
+FieldRecord = namedtuple("FieldRecord",
+                         ["field_name", "field_type", "description",
+                          "visibility", "origin", "unit", "default_value"])
+
+# An action of the journal: the action type (first element of the history
+# list), the size in bytes of the record and the data of the record (the
+# compressed history, or the history itself if it cannot be serialized)
+JournalRecord = namedtuple("JournalRecord",
+                           ["action", "size", "data", "encoded"])
+
+
+class UndoJournal(object):
+    """Bounded stack of the undo (or redo) actions of a project.
+
+    The actions are the history lists of Project.undo and Project.redo (the
+    action type followed by its parameters). They are kept in memory as
+    compressed records, and when the size of these records exceeds the
+    memory cap, the oldest records are moved to a sidecar SQLite file. The
+    journal behaves like the list it replaces (append, pop, clear, len,
+    indexing, iteration and comparison to a list).
+
+    :param path: path of the sidecar SQLite file
+    :param memory_cap: memory (in bytes) used by the records kept in memory
+
+    .. Methods:
+        - append: adds an action at the top of the journal
+        - clear: removes all the actions of the journal
+        - decode: gives the history list of a record
+        - encode: gives the record of a history list
+        - pop: removes and returns the action at the top of the journal
+        - spill: moves the oldest records to the sidecar file
+    """
+
+    def __init__(self, path, memory_cap):
+        """Initialization of the journal.
+
+        :param path: path of the sidecar SQLite file, an existing file
+                     (left by a previous session) is removed
+        :param memory_cap: memory (in bytes) used by the records kept in
+                           memory
+        """
+
+        self.path = path
+        self.memory_cap = memory_cap
+        self.memory_size = 0
+        self._records = deque()
+        self._spilled = 0
+        self._connection = None
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __getitem__(self, index):
+        length = len(self)
+
+        if index < 0:
+            index += length
+
+        if not 0 <= index < length:
+            raise IndexError("journal index out of range")
+
+        if index >= self._spilled:
+            return self.decode(self._records[index - self._spilled])
+
+        row = self._connection.execute(
+            "SELECT action, data FROM journal WHERE position = ?",
+            [index]).fetchone()
+        return self.decode(JournalRecord(row[0], len(row[1]), row[1], True))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __len__(self):
+        return self._spilled + len(self._records)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, history):
+        """Add an action at the top of the journal.
+
+        :param history: history list of the action
+        """
+
+        record = self.encode(history)
+        self._records.append(record)
+        self.memory_size += record.size
+        self.spill()
+
+    def clear(self):
+        """Remove all the actions of the journal."""
+
+        self._records.clear()
+        self.memory_size = 0
+
+        if self._spilled:
+            self._connection.execute("DELETE FROM journal")
+            self._connection.commit()
+            self._spilled = 0
+
+    @staticmethod
+    def decode(record):
+        """Give the history list of a record.
+
+        :param record: JournalRecord
+        :return: the history list
+        """
+
+        if not record.encoded:
+            return record.data
+
+        return pickle.loads(zlib.decompress(record.data))
+
+    @staticmethod
+    def encode(history):
+        """Give the record of a history list.
+
+        The database rows of the fields (remove_tags action) are stored as
+        FieldRecord.
+
+        :param history: history list of an action
+        :return: JournalRecord
+        """
+
+        if history[0] == "remove_tags":
+            history = list(history)
+            history[1] = [[FieldRecord(tag[0].field_name, tag[0].field_type,
+                                       tag[0].description,
+                                       tag[0].visibility, tag[0].origin,
+                                       tag[0].unit, tag[0].default_value)]
+                          + list(tag[1:])
+                          for tag in history[1]]
+
+        try:
+            data = zlib.compress(pickle.dumps(history,
+                                              pickle.HIGHEST_PROTOCOL))
+
+        except (AttributeError, pickle.PicklingError, TypeError):
+            # The history is kept as it is, with a rough size estimate
+            return JournalRecord(history[0], 64 * len(history), history,
+                                 False)
+
+        return JournalRecord(history[0], len(data), data, True)
+
+    def pop(self):
+        """Remove and return the action at the top of the journal.
+
+        :return: the history list of the action
+        """
+
+        if not self._records:
+
+            if not self._spilled:
+                raise IndexError("pop from empty journal")
+
+            # The most recent record of the sidecar file is put back in memory
+            self._spilled -= 1
+            row = self._connection.execute(
+                "SELECT action, data FROM journal WHERE position = ?",
+                [self._spilled]).fetchone()
+            self._connection.execute("DELETE FROM journal WHERE position = ?",
+                                     [self._spilled])
+            self._connection.commit()
+            return self.decode(JournalRecord(row[0], len(row[1]), row[1],
+                                             True))
+
+        record = self._records.pop()
+        self.memory_size -= record.size
+        return self.decode(record)
+
+    def spill(self):
+        """Move the oldest records to the sidecar file, until the records kept
+        in memory fit in the memory cap.
+
+        The last record always stays in memory, and the records that could
+        not be serialized are never moved.
+        """
+
+        spilled_records = []
+
+        while (self.memory_size > self.memory_cap and
+               len(self._records) > 1 and self._records[0].encoded):
+            record = self._records.popleft()
+            self.memory_size -= record.size
+            spilled_records.append([self._spilled + len(spilled_records),
+                                    record.action, record.data])
+
+        if not spilled_records:
+            return
+
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS journal (position INTEGER PRIMARY "
+                "KEY, action TEXT, data BLOB)")
+
+        self._connection.executemany(
+            "INSERT INTO journal (position, action, data) VALUES (?, ?, ?)",
+            spilled_records)
+        self._connection.commit()
+        self._spilled += len(spilled_records)
@@ -117,6 +117,8 @@ class Config:
           the "Saved projects" menu
         - get_max_thumbnails:  get max thumbnails number at the data browser
           bottom
+        - get_max_undo_memory: returns the memory (in MB) used by the undo and
+          redo journals before spilling to the disk
         - get_mia_path: returns the software's install path
         - get_mri_conv_path: returns the MRIManager.jar path
         - getNbAllSlicesMax: returns the maximum number of slices to display in
@@ -180,6 +182,8 @@ class Config:
           the "Saved projects" menu
         - set_max_thumbnails: set max thumbnails number at the data browser
                               bottom
+        - set_max_undo_memory: set the memory (in MB) used by the undo and
+          redo journals before spilling to the disk
         - set_mia_path: set the software's install path (currently commented)
         - set_mri_conv_path: set the MRIManager.jar path
         - setNbAllSlicesMax: set the maximum number of slices to display in
@@ -474,6 +478,18 @@ class Config:
         except KeyError as e:
             return 5
 
+    def get_max_undo_memory(self):
+        """Get the memory used by each of the undo and redo journals of a
+        project before its oldest actions are moved to the disk.
+
+        :returns: Integer (MB)
+        """
+        try:
+            return int(self.config["max_undo_memory"])
+
+        except KeyError as e:
+            return 64
+
     def get_mia_path(self):
         """Get the path to the folder containing the processes, properties
         and resources folders of mia (mia_path).
@@ -970,6 +986,16 @@ class Config:
         # Then save the modification
         self.saveConfig()
 
+    def set_max_undo_memory(self, max_undo_memory):
+        """Set the memory used by each of the undo and redo journals of a
+        project before its oldest actions are moved to the disk.
+
+        :param max_undo_memory: Integer (MB)
+        """
+        self.config["max_undo_memory"] = max_undo_memory
+        # Then save the modification
+        self.saveConfig()
+
     # def set_mia_path(self, path):
     #     """
     #
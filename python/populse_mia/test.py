@@ -94,7 +94,11 @@ from populse_mia.data_manager.project import (COLLECTION_BRICK,
                                               TAG_EXP_TYPE, TAG_FILENAME,
                                               TAG_ORIGIN_USER, TAG_TYPE)
 from populse_mia.data_manager.project_properties import SavedProjects
+from populse_mia.data_manager.undo_journal import UndoJournal
 from populse_mia.software_properties import Config, verCmp
+from populse_mia.user_interface.data_browser.data_browser import (
+                                                           BRICKS_ROLE,
+                                                           TableDataBrowser)
 from populse_mia.user_interface.data_browser.modify_table import ModifyTable
 from populse_mia.user_interface.main_window import MainWindow
 from populse_mia.user_interface.pipeline_manager.process_library import (
@@ -500,6 +504,18 @@ class TestMIADataBrowser(unittest.TestCase):
         bricks_column = (self.main_window.data_browser.table_data.
                                                        get_tag_column("Bricks"))
 
+        # The Bricks column is painted by a delegate, the brick names are
+        # stored in the items and the buttons are only built on hover
+        bricks_item = self.main_window.data_browser.table_data.item(
+                                                                  8,
+                                                                  bricks_column)
+        self.assertEqual(bricks_item.data(BRICKS_ROLE)[0][1], "smooth1")
+        self.assertIsNone(self.main_window.data_browser.table_data.cellWidget(
+                                                                  8,
+                                                                  bricks_column))
+        self.main_window.data_browser.table_data.cellEntered.emit(
+                                                                  8,
+                                                                  bricks_column)
         bricks_widget = self.main_window.data_browser.table_data.cellWidget(
                                                                   8,
                                                                   bricks_column)
@@ -723,6 +739,39 @@ class TestMIADataBrowser(unittest.TestCase):
         self.assertEqual(count_table.table.item(2, 3).text(), "5")
         self.assertEqual(count_table.table.item(3, 3).text(), "5")
 
+    def test_deferred_fill(self):
+        """
+        Tests the deferred fill of the table when a project is opened
+        """
+        project_8_path = self.get_new_test_project()
+        TableDataBrowser.first_page_rows = 3
+
+        try:
+            self.main_window.switch_project(project_8_path, "project_8")
+        finally:
+            TableDataBrowser.first_page_rows = 200
+
+        table_data = self.main_window.data_browser.table_data
+        self.assertIsNotNone(table_data.pending_fill)
+        self.assertEqual(table_data.rowCount(), 9)
+        bw_column = table_data.get_tag_column("BandWidth")
+
+        for row in range(9):
+            self.assertIsNotNone(table_data.item(row, 0))
+
+        self.assertIsNone(table_data.item(8, bw_column))
+
+        table_data.finish_fill()
+        self.assertIsNone(table_data.pending_fill)
+        self.assertIsNone(self.main_window.open_fill_start)
+
+        for row in range(9):
+            self.assertIsNotNone(table_data.item(row, bw_column))
+
+        stages = [stage[0] for stage in self.main_window.open_timer.stages]
+        self.assertEqual(stages, ["database", "previous project cleanup",
+                                  "schema", "first page", "background fill"])
+
     def test_mia_preferences(self):
         """
         Tests the MIA preferences popup
@@ -1575,10 +1624,57 @@ class TestMIADataBrowser(unittest.TestCase):
         self.assertEqual(self.main_window.tabs.tabText(index), "Pipeline "
                                                                "Manager")
 
+        # Changes made outside of the Data Browser
+        session = self.main_window.project.session
+        session.set_value(COLLECTION_CURRENT, scans[0], "BandWidth", 12345.0)
+        session.remove_document(COLLECTION_CURRENT, scans[1])
+        self.assertEqual(session.get_changes(
+            COLLECTION_CURRENT, self.main_window.data_browser_revision),
+            ({scans[0], scans[1]}, set()))
+
         self.main_window.tabs.setCurrentIndex(0)
         index = self.main_window.tabs.currentIndex()
         self.assertEqual(self.main_window.tabs.tabText(index), "Data Browser")
 
+        # Only the changes are applied to the table
+        table_data = self.main_window.data_browser.table_data
+        self.assertIsNone(self.main_window.data_browser_revision)
+        table_scans = [table_data.item(row, 0).text()
+                       for row in range(table_data.rowCount())]
+        self.assertEqual(len(table_scans), 8)
+        self.assertNotIn(scans[1], table_scans)
+        item = table_data.item(table_scans.index(scans[0]),
+                               table_data.get_tag_column("BandWidth"))
+        self.assertEqual(float(item.text()), 12345.0)
+
+    def test_undo_journal(self):
+        """
+        Tests the spillover of the undo journal to its sidecar file
+        """
+        journal_path = os.path.join(tempfile.mkdtemp(prefix='mia_tests'),
+                                    'undos_journal.db')
+        journal = UndoJournal(journal_path, 1000)
+        histories = [["modified_values",
+                      [["data/raw_data/scan_%d_%d.nii" % (i, j), "BandWidth",
+                        float(i * j), None] for j in range(50)]]
+                     for i in range(10)]
+
+        for history in histories:
+            journal.append(history)
+
+        self.assertTrue(os.path.exists(journal_path))
+        self.assertLessEqual(journal.memory_size, 1000)
+        self.assertEqual(len(journal), 10)
+        self.assertEqual(journal, histories)
+        self.assertEqual(journal[0], histories[0])
+        self.assertEqual(journal[-1], histories[-1])
+
+        for history in reversed(histories):
+            self.assertEqual(journal.pop(), history)
+
+        self.assertEqual(journal, [])
+        shutil.rmtree(os.path.dirname(journal_path))
+
     def test_undo_redo_databrowser(self):
         """
         Tests the databrowser undo/redo
@@ -1598,12 +1694,12 @@ class TestMIADataBrowser(unittest.TestCase):
         self.assertEqual(float(bw_old), 50000)
         bw_item.setSelected(True)
         bw_item.setText("0")
-        self.assertEqual(self.main_window.project.undos, [['modified_values',
-                                                           [['data/raw_data/Guerbet-C6-2014-Rat-K52-Tube27-2014-02-14_10-23-17-02-G1_Guerbet_Anat-RARE__pvm_-00-02-20.000.nii',
-                                                             'BandWidth',
-                                                             50000.0,
-                                                             0.0]]
-                                                         ]])
+        self.assertEqual(self.main_window.project.undos,
+                         [['modified_values_bulk',
+                           {'BandWidth': 0.0},
+                           {'BandWidth': [['data/raw_data/Guerbet-C6-2014-Rat-K52-Tube27-2014-02-14_10-23-17-02-G1_Guerbet_Anat-RARE__pvm_-00-02-20.000.nii',
+                                           50000.0]]}
+                          ]])
         self.assertEqual(self.main_window.project.redos, [])
         bw_item = self.main_window.data_browser.table_data.item(0, bw_column)
         bw_set = bw_item.text()
@@ -1612,25 +1708,47 @@ class TestMIADataBrowser(unittest.TestCase):
         bw_item = self.main_window.data_browser.table_data.item(0, bw_column)
         bw_undo = bw_item.text()
         self.assertEqual(float(bw_undo), 50000)
-        self.assertEqual(self.main_window.project.redos, [['modified_values',
-                                                           [['data/raw_data/Guerbet-C6-2014-Rat-K52-Tube27-2014-02-14_10-23-17-02-G1_Guerbet_Anat-RARE__pvm_-00-02-20.000.nii',
-                                                             'BandWidth',
-                                                             50000.0,
-                                                             0.0]]
-                                                         ]])
+        self.assertEqual(self.main_window.project.redos,
+                         [['modified_values_bulk',
+                           {'BandWidth': 0.0},
+                           {'BandWidth': [['data/raw_data/Guerbet-C6-2014-Rat-K52-Tube27-2014-02-14_10-23-17-02-G1_Guerbet_Anat-RARE__pvm_-00-02-20.000.nii',
+                                           50000.0]]}
+                          ]])
         self.assertEqual(self.main_window.project.undos, [])
         self.main_window.action_redo.trigger()
-        self.assertEqual(self.main_window.project.undos, [['modified_values',
-                                                           [['data/raw_data/Guerbet-C6-2014-Rat-K52-Tube27-2014-02-14_10-23-17-02-G1_Guerbet_Anat-RARE__pvm_-00-02-20.000.nii',
-                                                             'BandWidth',
-                                                             50000.0,
-                                                             0.0]]
-                                                         ]])
+        self.assertEqual(self.main_window.project.undos,
+                         [['modified_values_bulk',
+                           {'BandWidth': 0.0},
+                           {'BandWidth': [['data/raw_data/Guerbet-C6-2014-Rat-K52-Tube27-2014-02-14_10-23-17-02-G1_Guerbet_Anat-RARE__pvm_-00-02-20.000.nii',
+                                           50000.0]]}
+                          ]])
         self.assertEqual(self.main_window.project.redos, [])
         bw_item = self.main_window.data_browser.table_data.item(0, bw_column)
         bw_redo = bw_item.text()
         self.assertEqual(int(bw_redo), 0)
 
+        # Testing multi-cell modified values undo/redo
+        table_data = self.main_window.data_browser.table_data
+        table_data.clearSelection()
+        for row in range(3):
+            table_data.item(row, bw_column).setSelected(True)
+        old_values = [float(table_data.item(row, bw_column).text())
+                      for row in range(3)]
+        table_data.item(1, bw_column).setText("100")
+        self.assertEqual(len(self.main_window.project.undos[-1][2][
+                                                              'BandWidth']), 3)
+        for row in range(3):
+            self.assertEqual(float(table_data.item(row, bw_column).text()),
+                             100)
+        self.main_window.action_undo.trigger()
+        for row in range(3):
+            self.assertEqual(float(table_data.item(row, bw_column).text()),
+                             old_values[row])
+        self.main_window.action_redo.trigger()
+        for row in range(3):
+            self.assertEqual(float(table_data.item(row, bw_column).text()),
+                             100)
+
         # Testing scan removal undo/redo
         self.assertEqual(len(self.main_window.project.session.get_documents_names(COLLECTION_CURRENT)), 9)
         self.assertEqual(len(self.main_window.project.session.get_documents_names(COLLECTION_INITIAL)), 9)
@@ -1651,6 +1769,7 @@ class TestMIADataBrowser(unittest.TestCase):
         self.main_window.data_browser.add_tag_action.trigger()
         add_tag = self.main_window.data_browser.pop_up_add_tag
         add_tag.text_edit_tag_name.setText("Test")
+        add_tag.text_edit_default_value.setText("def_value")
         QTest.mouseClick(add_tag.push_button_ok, Qt.LeftButton)
         self.assertTrue("Test" in self.main_window.project.session.get_fields_names(COLLECTION_CURRENT))
         self.assertTrue("Test" in self.main_window.project.session.get_fields_names(COLLECTION_INITIAL))
@@ -1660,6 +1779,11 @@ class TestMIADataBrowser(unittest.TestCase):
         self.main_window.action_redo.trigger()
         self.assertTrue("Test" in self.main_window.project.session.get_fields_names(COLLECTION_CURRENT))
         self.assertTrue("Test" in self.main_window.project.session.get_fields_names(COLLECTION_INITIAL))
+        self.assertEqual(self.main_window.project.undos[-1][6],
+                         ["value", "def_value"])
+        for document in self.main_window.project.session.get_documents_names(COLLECTION_CURRENT):
+            self.assertEqual(self.main_window.project.session.get_value(COLLECTION_CURRENT, document, "Test"), "def_value")
+            self.assertEqual(self.main_window.project.session.get_value(COLLECTION_INITIAL, document, "Test"), "def_value")
 
         # Testing remove tag undo/redo
         self.main_window.data_browser.remove_tag_action.trigger()
@@ -1699,6 +1823,41 @@ class TestMIADataBrowser(unittest.TestCase):
         self.assertEqual(self.main_window.windowTitle(),
                          "MIA - Multiparametric Image Analysis (Admin mode) - Unnamed project")
 
+    def test_update_colors(self):
+        """
+        Tests that only the modified cells are recolored
+        """
+        project_8_path = self.get_new_test_project()
+        self.main_window.switch_project(project_8_path, "project_8")
+        table_data = self.main_window.data_browser.table_data
+        bandwidth_column = table_data.get_tag_column("BandWidth")
+        item = table_data.item(0, bandwidth_column)
+        scan = table_data.item(0, 0).text()
+
+        # Nothing left to recolor after the project switch
+        self.assertEqual(table_data.dirty_cells, set())
+        self.assertEqual(len(table_data.colored_parity),
+                         len(table_data.scans_to_visualize))
+        white = item.background().color()
+
+        item.setSelected(True)
+        item.setText("25000")
+        self.assertEqual(table_data.dirty_cells, set())
+        self.assertNotEqual(item.background().color(), white)
+
+        # A marked cell is recolored even if its background was changed
+        other_item = table_data.item(1, bandwidth_column)
+        other_color = other_item.background().color()
+        other_item.setBackground(QtGui.QColor(0, 0, 0))
+        table_data.update_colors()
+        self.assertEqual(other_item.background().color(),
+                         QtGui.QColor(0, 0, 0))
+        table_data.mark_dirty(cells=[(table_data.item(1, 0).text(),
+                                      "BandWidth")])
+        table_data.update_colors()
+        self.assertEqual(other_item.background().color(), other_color)
+        self.assertIn(scan, table_data.colored_parity)
+
     def test_utils(self):
         """
         Test the utils functions
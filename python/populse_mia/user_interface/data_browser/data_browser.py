@@ -4,6 +4,7 @@ Module to define data browser tab appearance, settings and methods.
 
 Contains:
     Class:
+        - BricksDelegate
         - DataBrowser
         - DateFormatDelegate
         - DateTimeFormatDelegate
@@ -23,6 +24,7 @@ Contains:
 
 import ast
 import os
+import time
 import traceback
 
 # PyQt5 imports
@@ -34,7 +36,7 @@ from PyQt5.QtWidgets import (
     QMessageBox, QPushButton, QProgressDialog, QDoubleSpinBox,
     QDateTimeEdit, QDateEdit, QTimeEdit, QApplication, QWidget, QVBoxLayout,
     QTableWidget, QHBoxLayout, QSplitter, QGridLayout, QItemDelegate,
-    QAbstractItemView)
+    QAbstractItemView, QStyle, QStyleOptionButton)
 
 # Populse_MIA imports
 from populse_mia.user_interface.data_browser.rapid_search import RapidSearch
@@ -70,6 +72,10 @@ from functools import partial
 # Variable shown everywhere when no value for the tag
 not_defined_value = "*Not Defined*"
 
+# Item data role holding the [(brick uuid, brick name), ...] list of a cell
+# of the Bricks column
+BRICKS_ROLE = Qt.UserRole + 1
+
 
 class DataBrowser(QWidget):
     """Widget that contains everything in the Data Browser tab.
@@ -170,8 +176,6 @@ class DataBrowser(QWidget):
         :param new_tag_unit: New tag unit
         """
 
-        values = []
-
         # We add the tag and a value for each scan in the Database
         self.project.session.add_field(COLLECTION_CURRENT, new_tag_name,
                                        tag_type, new_tag_description, True,
@@ -181,21 +185,18 @@ class DataBrowser(QWidget):
                                        tag_type, new_tag_description, True,
                                        TAG_ORIGIN_USER, new_tag_unit,
                                        new_default_value)
-        for scan in self.project.session.get_documents(COLLECTION_CURRENT):
-            self.project.unsavedModifications = True
-            self.project.session.add_value(
-                COLLECTION_CURRENT, getattr(scan, TAG_FILENAME),
-                new_tag_name, table_to_database(new_default_value, tag_type))
-            self.project.session.add_value(
-                COLLECTION_INITIAL, getattr(scan, TAG_FILENAME),
-                new_tag_name, table_to_database(new_default_value, tag_type))
-            values.append([getattr(scan, TAG_FILENAME), new_tag_name,
-                           table_to_database(new_default_value, tag_type),
-                           table_to_database(new_default_value, tag_type)])
+        database_value = table_to_database(new_default_value, tag_type)
 
-        # For history
+        for collection in (COLLECTION_CURRENT, COLLECTION_INITIAL):
+            self.project.session.fill_field(collection, new_tag_name,
+                                            database_value)
+
+        self.project.unsavedModifications = True
+
+        # For history, the column is filled with the default value
         history_maker = ["add_tag", new_tag_name, tag_type, new_tag_unit,
-                         new_default_value, new_tag_description, values]
+                         new_default_value, new_tag_description,
+                         ["value", database_value]]
         self.project.undos.append(history_maker)
         self.project.redos.clear()
 
@@ -244,8 +245,6 @@ class DataBrowser(QWidget):
         :param new_tag_name: New tag name
         """
 
-        values = []
-
         # We add the new tag in the Database
         tag_cloned = self.project.session.get_field(
             COLLECTION_CURRENT,tag_to_clone)
@@ -259,30 +258,18 @@ class DataBrowser(QWidget):
             COLLECTION_INITIAL, new_tag_name, tag_cloned.field_type,
             tag_cloned_init.description, True, TAG_ORIGIN_USER,
             tag_cloned.unit, tag_cloned.default_value)
+
+        # The values of the tag to clone are copied with the new tag name
+        for collection in (COLLECTION_CURRENT, COLLECTION_INITIAL):
+            self.project.session.copy_field(collection, tag_to_clone,
+                                            new_tag_name)
+
         self.project.unsavedModifications = True
-        for scan in self.project.session.get_documents(COLLECTION_CURRENT):
-
-            # If the tag to clone has a value, we add this value with the
-            # new tag name in the Database
-            cloned_cur_value = self.project.session.get_value(
-                COLLECTION_CURRENT, getattr(scan, TAG_FILENAME), tag_to_clone)
-            cloned_init_value = self.project.session.get_value(
-                COLLECTION_INITIAL, getattr(scan, TAG_FILENAME), tag_to_clone)
-            if cloned_cur_value is not None or cloned_init_value is not None:
-                self.project.session.add_value(
-                    COLLECTION_CURRENT, getattr(scan, TAG_FILENAME),
-                    new_tag_name, cloned_cur_value)
-                self.project.session.add_value(
-                    COLLECTION_INITIAL, getattr(scan, TAG_FILENAME),
-                    new_tag_name, cloned_init_value)
-                values.append(
-                    [getattr(scan, TAG_FILENAME), new_tag_name,
-                     cloned_cur_value, cloned_init_value])
 
-        # For history
+        # For history, the column is filled with the cloned tag values
         history_maker = ["add_tag", new_tag_name, tag_cloned.field_type,
                          tag_cloned.unit, tag_cloned.default_value,
-                         tag_cloned.description, values]
+                         tag_cloned.description, ["tag", tag_to_clone]]
         self.project.undos.append(history_maker)
         self.project.redos.clear()
 
@@ -631,6 +618,83 @@ class DataBrowser(QWidget):
         self.frame_advanced_search.setHidden(True)
 
 
+class BricksDelegate(QItemDelegate):
+    """Delegate that paints the Bricks column of the TableDataBrowser.
+
+    The brick names are drawn as push buttons, without instantiating any
+    widget. The real buttons are only built by the table for the cell that
+    is hovered (see TableDataBrowser.show_bricks_buttons).
+    """
+
+    # Margin around the buttons and spacing between two buttons, also used
+    # for the layout of the hovered cell to avoid any visual jump
+    margin = 6
+    spacing = 4
+
+    def __init__(self, parent=None):
+        """Initialization of the class
+
+        :param parent: QWidget parent
+        """
+        QItemDelegate.__init__(self, parent)
+
+    def button_height(self, option):
+        """Return the height of a brick button.
+
+        :param option: style option of the painted item
+        :return: height of one button in pixels
+        """
+        return option.fontMetrics.height() + 2 * self.margin
+
+    def paint(self, painter, option, index):
+        """Override of the paint method, draw one button per brick.
+
+        :param painter: QPainter used to draw the item
+        :param option: style option of the painted item
+        :param index: index of the painted item
+        """
+        bricks = index.data(BRICKS_ROLE)
+
+        if not bricks:
+            QItemDelegate.paint(self, painter, option, index)
+            return
+
+        self.drawBackground(painter, option, index)
+        style = QApplication.style()
+        height = self.button_height(option)
+        top = option.rect.top() + self.margin
+
+        for brick_uuid, brick_name in bricks:
+            button = QStyleOptionButton()
+            button.rect = QtCore.QRect(
+                option.rect.left() + self.margin, top,
+                option.rect.width() - 2 * self.margin, height)
+            button.text = brick_name
+            button.state = QStyle.State_Enabled
+            style.drawControl(QStyle.CE_PushButton, button, painter)
+            top += height + self.spacing
+
+    def sizeHint(self, option, index):
+        """Override of the sizeHint method, room for the stacked buttons.
+
+        :param option: style option of the item
+        :param index: index of the item
+        :return: the QSize of the item
+        """
+        bricks = index.data(BRICKS_ROLE)
+
+        if not bricks:
+            return QItemDelegate.sizeHint(self, option, index)
+
+        width = max(option.fontMetrics.width(brick_name)
+                    for brick_uuid, brick_name in bricks)
+        height = self.button_height(option)
+        return QtCore.QSize(
+            width + 4 * self.margin,
+            len(bricks) * (height + self.spacing) - self.spacing +
+            2 * self.margin)
+
+
 class DateFormatDelegate(QItemDelegate):
     """Delegate that is used to handle dates in the TableDataBrowser."""
     def __init__(self, parent=None):
@@ -682,6 +746,7 @@ class TableDataBrowser(QTableWidget):
         - add_columns: add columns
         - add_path: call a pop-up to add any document to the project
         - add_rows: insert rows if they are not already in the table
+        - apply_changes: updates the table with the changed documents and tags
         - change_cell_color: changes the background color and the value of
            cells when edited by the user
         - clear_cell: clear the selected cells
@@ -691,16 +756,26 @@ class TableDataBrowser(QTableWidget):
            reset user tags
         - fill_cells_update_table: initialize and fills the cells of the table
         - fill_headers: initialize and fill the headers of the table
+        - fill_next_chunk: fill the next rows of a deferred fill
+        - fill_rows_by_chunks: fill rows of the table by time-sliced chunks
+        - finish_fill: fill the rows left by a deferred fill
+        - get_bricks_names: fetch the names of bricks in a single query
         - get_current_filter: get the current data browser selection
+        - get_documents_by_name: get the documents of scans in one query
         - get_index_insertion: get index insertion of a new column
         - get_scan_row: return the row index of the scan
         - get_tag_column: return the column index of the tag
+        - mark_dirty: record the cells to recolor
         - mouseReleaseEvent: called when clicking released on cells
         - multiple_sort_infos: sort the table according to the tags specify
            in list_tags
         - multiple_sort_pop_up: display the multiple sort pop-up
+        - release_bricks_buttons: remove the buttons of the hovered Bricks
+           cell
+        - remove_rows: remove the rows of scans from the table
         - remove_scan: remove documents from table and project
         - reset_cell: reset the selected cells to their original values
+        - reset_colors: force the recoloring of the whole table
         - reset_column: reset the selected columns to their original values
         - reset_row: reset the selected rows to their original values
         - section_moved: called when the columns of the data_browser are moved
@@ -708,10 +783,13 @@ class TableDataBrowser(QTableWidget):
            to select the whole column
         - select_all_columns: called from context menu to select the columns
         - selection_changed: called when the selection is changed
+        - set_bricks_item: fill an item of the Bricks column
         - show_brick_history: show brick history pop-up
+        - show_bricks_buttons: build the buttons of a hovered Bricks cell
         - sort_column: sort the current column
         - sort_updated: called when the button advanced search is called
-        - update_colors: update the background of all the cells
+        - update_cells: update the items of cells modified in the database
+        - update_colors: update the background of the dirty cells
         - update_selection: called after searches to update the selection
         - update_table: fill the table with the project's data
         - update_visualized_columns: update the visualized tags
@@ -721,6 +799,16 @@ class TableDataBrowser(QTableWidget):
 
     """
 
+    # Time (in s) spent filling rows before the progress dialog and the
+    # event loop are updated (see fill_rows_by_chunks)
+    fill_time_budget = 0.05
+    # Number of rows filled before a deferred fill returns
+    # (see fill_cells_update_table)
+    first_page_rows = 200
+
+    # Emitted when the rows of a deferred fill are all filled
+    fill_finished = QtCore.pyqtSignal()
+
     def __init__(self, project, data_browser, tags_to_display,
                  update_values, activate_selection, link_viewer=True):
         """Initialization of the class
@@ -743,7 +831,16 @@ class TableDataBrowser(QTableWidget):
         self.update_values = update_values
         self.activate_selection = activate_selection
         self.link_viewer = link_viewer
-        self.bricks = {}
+        # Cell of the Bricks column whose buttons are currently built
+        self.bricks_buttons_cell = None
+        # Colored cells and cells to recolor (see update_colors)
+        self.reset_colors()
+        # Rows left by a deferred fill ([fill_row, scans, next row]),
+        # filled by chunks at each timeout of fill_timer
+        self.pending_fill = None
+        self.fill_timer = QtCore.QTimer(self)
+        self.fill_timer.setSingleShot(True)
+        self.fill_timer.timeout.connect(self.fill_next_chunk)
 
         self.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
 
@@ -768,6 +865,11 @@ class TableDataBrowser(QTableWidget):
         self.horizontalHeader().sectionMoved.connect(self.section_moved)
         self.verticalHeader().setMinimumSectionSize(30)
 
+        # The Bricks column is painted by the delegate, the brick buttons
+        # are only built for the hovered cell
+        self.setItemDelegate(BricksDelegate(self))
+        self.setMouseTracking(True)
+        self.cellEntered.connect(self.show_bricks_buttons)
 
         self.update_table(True)
 
@@ -781,6 +883,8 @@ class TableDataBrowser(QTableWidget):
         :param tag: tag name to add
         """
 
+        self.finish_fill()
+
         self.itemChanged.disconnect()
 
         self.itemSelectionChanged.disconnect()
@@ -827,6 +931,7 @@ class TableDataBrowser(QTableWidget):
         # Selection updated
         self.update_selection()
 
+        self.mark_dirty(tags=[tag])
         self.update_colors()
 
         self.itemSelectionChanged.connect(self.selection_changed)
@@ -836,6 +941,8 @@ class TableDataBrowser(QTableWidget):
     def add_columns(self):
         """Add columns."""
 
+        self.finish_fill()
+
         self.itemChanged.disconnect()
 
         self.itemSelectionChanged.disconnect()
@@ -858,6 +965,7 @@ class TableDataBrowser(QTableWidget):
 
                 column_index = self.get_index_insertion(tag)
                 self.insertColumn(column_index)
+                self.mark_dirty(tags=[tag])
 
                 item = QtWidgets.QTableWidgetItem()
                 self.setHorizontalHeaderItem(column_index, item)
@@ -943,100 +1051,90 @@ class TableDataBrowser(QTableWidget):
     def add_rows(self, rows):
         """Insert rows if they are not already in the table.
 
+        The rows are filled by time-sliced chunks (see fill_rows_by_chunks),
+        the insertion stops if it is cancelled from the progress dialog.
+
         :param rows: list of all scans
         """
 
+        self.finish_fill()
+
         self.setSortingEnabled(False)
 
         self.itemSelectionChanged.disconnect()
 
         self.itemChanged.disconnect()
 
-        cells_number = len(rows) * self.columnCount()
-        self.progress = QProgressDialog("Please wait while the paths are "
-                                        "being added...", None, 0,
-                                        cells_number)
-        self.progress.setMinimumDuration(0)
-        self.progress.setValue(0)
-        self.progress.setMinimumWidth(350) # For mac OS
-        self.progress.setWindowTitle("Adding the paths")
-        self.progress.setWindowFlags(Qt.Window | Qt.WindowTitleHint |
-                                     Qt.CustomizeWindowHint)
-        self.progress.setModal(True)
-        self.progress.setAttribute(Qt.WA_DeleteOnClose, True)
-        self.progress.show()
-
-        idx = 0
+        # Scans added only if they are not already in the table
+        table_scans = {self.item(row, 0).text()
+                       for row in range(self.rowCount())
+                       if self.item(row, 0) is not None}
+        rows_to_add = []
         for scan in rows:
-            # Scan added only if it's not already in the table
-            if self.get_scan_row(scan) is None:
-                rowCount = self.rowCount()
-                self.insertRow(rowCount)
+            if scan not in table_scans:
+                table_scans.add(scan)
+                rows_to_add.append(scan)
 
-                # Columns filled for the row being added
-                for column in range(0, self.columnCount()):
+        documents = self.get_documents_by_name(COLLECTION_CURRENT,
+                                               rows_to_add)
+        tags = [self.horizontalHeaderItem(column).text()
+                for column in range(self.columnCount())]
+        tag_types = {field.field_name: field.field_type
+                     for field in self.project.session.get_fields(
+                                                           COLLECTION_CURRENT)}
 
-                    idx += 1
-                    self.progress.setValue(idx)
-                    QApplication.processEvents()
+        # Names of the bricks of the added scans, fetched in one query
+        if TAG_BRICKS in tags:
+            bricks_names = self.get_bricks_names(
+                document[TAG_BRICKS] for document in documents.values())
+        else:
+            bricks_names = {}
 
-                    item = QtWidgets.QTableWidgetItem()
-                    tag = self.horizontalHeaderItem(column).text()
+        def fill_row(idx, scan):
+            """Insert and fill the row of a scan."""
+            rowCount = self.rowCount()
+            self.insertRow(rowCount)
+            self.mark_dirty(scans=[scan])
+            document = documents.get(scan)
 
-                    if column == 0:
-                        # name tag, not editable
-                        item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                        set_item_data(item, scan, FIELD_TYPE_STRING)
-                    else:
-                        cur_value = self.project.session.get_value(
-                            COLLECTION_CURRENT, scan, tag)
-                        if cur_value is not None:
-                            if tag != TAG_BRICKS:
-                                set_item_data(
-                                    item, cur_value,
-                                    self.project.session.get_field(
-                                        COLLECTION_CURRENT, tag).field_type)
-                            else:
-                                # Tag bricks, display list with buttons
-                                widget = QWidget()
-                                widget.moveToThread(QApplication.instance(
-                                ).thread())
-                                layout = QVBoxLayout()
-                                for brick_number in range(0, len(cur_value)):
-                                    brick_uuid = cur_value[brick_number]
-                                    brick_name = self.project.session.get_value(
-                                                               COLLECTION_BRICK,
-                                                               brick_uuid,
-                                                               BRICK_NAME)
-                                    brick_name_button = QPushButton(brick_name)
-                                    brick_name_button.moveToThread(
-                                        QApplication.instance().thread())
-                                    self.bricks[brick_name_button] = brick_uuid
-                                    brick_name_button.clicked.connect(
-                                        self.show_brick_history)
-                                    if 'FileName' in scan:
-                                        brick_name_button.clicked.connect(
-                                            partial(self.show_data_history,
-                                                    scan['FileName']))
-                                    layout.addWidget(brick_name_button)
-                                widget.setLayout(layout)
-                                self.setCellWidget(rowCount, column, widget)
+            # Columns filled for the row being added
+            for column, tag in enumerate(tags):
+                item = QtWidgets.QTableWidgetItem()
 
+                if column == 0:
+                    # name tag, not editable
+                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                    set_item_data(item, scan, FIELD_TYPE_STRING)
+                else:
+                    cur_value = (document[tag] if document is not None
+                                 else None)
+                    if cur_value is not None:
+                        if tag != TAG_BRICKS:
+                            set_item_data(item, cur_value, tag_types[tag])
+                        else:
+                            # Tag bricks, painted by the delegate
+                            self.set_bricks_item(item, cur_value,
+                                                 bricks_names)
+
+                    else:
+                        if tag != TAG_BRICKS:
+                            set_item_data(
+                                item, not_defined_value, FIELD_TYPE_STRING)
+                            font = item.font()
+                            font.setItalic(True)
+                            font.setBold(True)
+                            item.setFont(font)
                         else:
-                            if tag != TAG_BRICKS:
-                                set_item_data(
-                                    item, not_defined_value, FIELD_TYPE_STRING)
-                                font = item.font()
-                                font.setItalic(True)
-                                font.setBold(True)
-                                item.setFont(font)
-                            else:
-                                set_item_data(item, "", FIELD_TYPE_STRING)
-                                # bricks not editable
-                                item.setFlags(
-                                    item.flags() & ~Qt.ItemIsEditable)
-                    self.setItem(rowCount, column, item)
+                            set_item_data(item, "", FIELD_TYPE_STRING)
+                            # bricks not editable
+                            item.setFlags(
+                                item.flags() & ~Qt.ItemIsEditable)
+                self.setItem(rowCount, column, item)
 
+        self.fill_rows_by_chunks(
+            rows_to_add, fill_row,
+            "Please wait while the paths are being added...",
+            "Adding the paths")
 
         # Crash if self.setSortingEnabled(True) because it calls sortByColumn()
         # self.setSortingEnabled(False)
@@ -1054,37 +1152,135 @@ class TableDataBrowser(QTableWidget):
 
         self.itemChanged.connect(self.change_cell_color)
 
-        self.progress.close()
+    def apply_changes(self, scans, tags):
+        """Update the table with the documents and the tags changed in the
+        database, as given by DatabaseSessionMIA.get_changes.
+
+        Only the changed rows and columns are touched: the removed documents
+        and tags are removed from the table, the added ones are inserted and
+        the cells of the modified ones are updated.
+
+        :param scans: filenames of the added, modified or removed documents
+        :param tags: names of the added, modified or removed tags
+        """
+
+        self.finish_fill()
+
+        if tags:
+            # Removed columns, before fill_headers renames the columns
+            field_names = set(self.project.session.get_fields_names(
+                COLLECTION_CURRENT))
+
+            for tag in tags:
+                column = self.get_tag_column(tag)
+
+                if column is not None and tag not in field_names:
+                    self.removeColumn(column)
+
+            old_tags = {self.horizontalHeaderItem(column).text()
+                        for column in range(self.columnCount())}
+            self.add_columns()
+            self.fill_headers()
+
+            # The columns added by add_columns are already filled
+            tags = [tag for tag in tags
+                    if tag in old_tags and tag in field_names and
+                    tag != TAG_FILENAME]
+
+        table_scans = {self.item(row, 0).text()
+                       for row in range(self.rowCount())
+                       if self.item(row, 0) is not None}
+        documents = self.get_documents_by_name(COLLECTION_CURRENT, scans)
+        removed_scans = [scan for scan in scans
+                         if scan in table_scans and scan not in documents]
+        added_scans = [scan for scan in scans
+                       if scan in documents and scan not in table_scans]
+
+        if removed_scans:
+            self.remove_rows(removed_scans)
+
+        if added_scans:
+            self.add_rows(added_scans)
+
+        table_tags = [self.horizontalHeaderItem(column).text()
+                      for column in range(1, self.columnCount())]
+        values = {scan: {tag: document[tag] for tag in table_tags}
+                  for scan, document in documents.items()
+                  if scan in table_scans}
+
+        if tags:
+            # Whole columns of the modified tags, fetched in one query
+            for document in self.project.session.get_documents(
+                    COLLECTION_CURRENT, fields=[TAG_FILENAME] + tags,
+                    as_list=True):
+                values.setdefault(document[0], {}).update(
+                    zip(tags, document[1:]))
+
+        self.itemChanged.disconnect()
+
+        if values:
+            self.update_cells(values)
+
+        if added_scans or values:
+            # Saved sort applied again, without going through sort_updated
+            column_to_sort = self.get_tag_column(self.project.getSortedTag())
+            header = self.horizontalHeader()
+            header_blocked = header.blockSignals(True)
+            self.setSortingEnabled(False)
+
+            if column_to_sort is not None:
+                header.setSortIndicator(column_to_sort,
+                                        self.project.getSortOrder())
+            else:
+                header.setSortIndicator(0, 0)
+
+            self.setSortingEnabled(True)
+            header.blockSignals(header_blocked)
+            self.update_colors()
+            self.resizeRowsToContents()
+
+        self.itemChanged.connect(self.change_cell_color)
 
     def change_cell_color(self, item_origin):
         """Change the background color and the value of cells when edited by
         the user.
-        Handle the multi-selection case.
+        Handle the multi-selection case: the value is validated once per
+        column type and all the cells are written with a single
+        set_values_bulk call.
 
         :param item_origin: item from where the call comes from
         """
 
+        self.finish_fill()
+
         self.itemChanged.disconnect()
         new_value = item_origin.data(Qt.EditRole)
+        selected_items = self.selectedItems()
+
+        # Tag of each selected column
+        columns_tags = {}
+        for item in selected_items:
+            col = item.column()
+            if col not in columns_tags:
+                columns_tags[col] = self.horizontalHeaderItem(col).text()
+
+        if (TAG_BRICKS in columns_tags.values() or
+                TAG_FILENAME in columns_tags.values()):
+            self.update_colors()
+            self.itemChanged.connect(self.change_cell_color)
+            return
+
+        fields = {field.field_name: field for field in
+                  self.project.session.get_fields(COLLECTION_CURRENT)}
 
         cells_types = []  # Will contain the type list of the selection
 
         # To reset the first cell already changed
         # self.fill_cells_update_table()
 
-        # For each item selected, we check the validity of the types
-        for item in self.selectedItems():
-            row = item.row()
-            col = item.column()
-            tag_name = self.horizontalHeaderItem(col).text()
-            tag_object = self.project.session.get_field(
-                COLLECTION_CURRENT, tag_name)
-            tag_type = tag_object.field_type
-
-            if tag_name == TAG_BRICKS or tag_name == TAG_FILENAME:
-                self.update_colors()
-                self.itemChanged.connect(self.change_cell_color)
-                return
+        # For each column selected, we check the validity of the types
+        for tag_name in columns_tags.values():
+            tag_type = fields[tag_name].field_type
 
             # Type added to types list
             if tag_type not in cells_types:
@@ -1146,55 +1342,46 @@ class TableDataBrowser(QTableWidget):
         # Otherwise we update the values
         else:
 
-            # For history
-            history_maker = list()
-            history_maker.append("modified_values")
-            modified_values = []
-
-            for item in self.selectedItems():
-                row = item.row()
-                col = item.column()
-                scan_path = self.item(row, 0).text()
-                tag_name = self.horizontalHeaderItem(col).text()
-                database_value = table_to_database(
-                    new_value,
-                    self.project.session.get_field(
-                        COLLECTION_CURRENT, tag_name).field_type)
-
-                # We only set the cell if it's not the tag name
-                if tag_name != TAG_FILENAME:
-
-                    old_value = self.project.session.get_value(
-                        COLLECTION_CURRENT, scan_path, tag_name)
-                    # The scan already has a value for the tag: we update it
-                    if old_value is not None:
-                        modified_values.append([scan_path, tag_name,
-                                                old_value, database_value])
-                        self.project.session.set_value(
-                            COLLECTION_CURRENT, scan_path,
-                            tag_name, database_value)
-                    # The scan does not have a value for the tag yet: we add it
-                    else:
-                        modified_values.append(
-                            [scan_path, tag_name, None, database_value])
-                        self.project.session.add_value(
-                            COLLECTION_CURRENT, scan_path,
-                            tag_name, database_value)
-
-                        # Font reset in case it was a not defined cell
-                        font = item.font()
-                        font.setItalic(False)
-                        font.setBold(False)
-                        item.setFont(font)
-
-                    set_item_data(
-                        item, new_value,
-                        self.project.session.get_field(
-                            COLLECTION_CURRENT, tag_name).field_type)
-
-            # For history
-            history_maker.append(modified_values)
-            self.project.undos.append(history_maker)
+            # Database value of each selected tag
+            database_values = {
+                tag_name: table_to_database(new_value,
+                                            fields[tag_name].field_type)
+                for tag_name in columns_tags.values()}
+
+            # Current values of the selected scans, in a single query
+            old_documents = self.get_documents_by_name(
+                COLLECTION_CURRENT,
+                {self.item(item.row(), 0).text() for item in selected_items})
+
+            values = {}  # {scan: {tag: new value}}
+            old_values = {}  # {tag: [[scan, old value], ...]}
+
+            for item in selected_items:
+                scan_path = self.item(item.row(), 0).text()
+                tag_name = columns_tags[item.column()]
+                old_document = old_documents.get(scan_path)
+                old_value = (old_document[tag_name]
+                             if old_document is not None else None)
+                values.setdefault(scan_path, {})[tag_name] = database_values[
+                                                                      tag_name]
+                old_values.setdefault(tag_name, []).append([scan_path,
+                                                            old_value])
+
+                # Font reset in case it was a not defined cell
+                if old_value is None:
+                    font = item.font()
+                    font.setItalic(False)
+                    font.setBold(False)
+                    item.setFont(font)
+
+                set_item_data(item, new_value, fields[tag_name].field_type)
+                self.mark_dirty(cells=[(scan_path, tag_name)])
+
+            self.project.session.set_values_bulk(COLLECTION_CURRENT, values)
+
+            # For history, the new value is stored once per tag
+            self.project.undos.append(["modified_values_bulk",
+                                       database_values, old_values])
             self.project.redos.clear()
 
             self.resizeColumnsToContents()  # Columns re-sized
@@ -1206,6 +1393,8 @@ class TableDataBrowser(QTableWidget):
     def clear_cell(self):
         """Clear the selected cells."""
 
+        self.finish_fill()
+
         # For history
         history_maker = []
         history_maker.append("modified_values")
@@ -1230,6 +1419,7 @@ class TableDataBrowser(QTableWidget):
             font.setItalic(True)
             font.setBold(True)
             item.setFont(font)
+            self.mark_dirty(cells=[(scan_name, tag_name)])
 
         # For history
         history_maker.append(modified_values)
@@ -1242,6 +1432,8 @@ class TableDataBrowser(QTableWidget):
         :param position: position of the mouse cursor
         """
 
+        self.finish_fill()
+
         self.itemChanged.disconnect()
 
         self.menu = QMenu(self)
@@ -1394,22 +1586,22 @@ class TableDataBrowser(QTableWidget):
         self.msg.buttonClicked.connect(self.msg.close)
         self.msg.show()
 
-    def fill_cells_update_table(self):
-        """Initialize and fill the cells of the table."""
-        cells_number = len(self.scans_to_visualize) * len(
-            self.horizontalHeader())
-        self.progress = QProgressDialog(
-            "Please wait while the cells are being filled...", None, 0,
-            cells_number)
-        self.progress.setMinimumDuration(0)
-        self.progress.setValue(0)
-        self.progress.setMinimumWidth(350) # For mac OS
-        self.progress.setWindowTitle("Filling the cells")
-        self.progress.setWindowFlags(Qt.Window | Qt.WindowTitleHint |
-                                     Qt.CustomizeWindowHint)
-        self.progress.setModal(True)
-        self.progress.setAttribute(Qt.WA_DeleteOnClose, True)
-        self.progress.show()
+    def fill_cells_update_table(self, deferred=False):
+        """Initialize and fill the cells of the table.
+
+        The rows are filled by time-sliced chunks (see fill_rows_by_chunks).
+        If the fill is cancelled from the progress dialog, the table is
+        truncated to the rows already filled.
+
+        :param deferred: if True, only the first first_page_rows rows are
+           filled before returning (with the FileName cell of all the
+           rows), the other rows are filled in the background by
+           fill_next_chunk and fill_finished is emitted at the end
+        """
+
+        # A deferred fill of the previous content is abandoned
+        self.pending_fill = None
+        self.fill_timer.stop()
 
         # Quick fix for #168 populse_mia issue
         try:
@@ -1422,8 +1614,10 @@ class TableDataBrowser(QTableWidget):
             # Not a unit test case!
             pass
 
-        idx = 0
-        row = 0
+        # Brick buttons built for the previous content are obsolete
+        self.release_bricks_buttons()
+        # All the items are recreated, they must all be recolored
+        self.reset_colors()
 
         dbs = self.project.session
 
@@ -1435,7 +1629,7 @@ class TableDataBrowser(QTableWidget):
                                              replace('\\', '\\\\').
                                              replace('"', '\"')
                                              for x in self.scans_to_visualize]))
-            scans = dbs.filter_documents(COLLECTION_CURRENT, req)
+            scans = list(dbs.filter_documents(COLLECTION_CURRENT, req))
         else:
             scans = []
         tags = [self.horizontalHeaderItem(column).text()
@@ -1444,13 +1638,16 @@ class TableDataBrowser(QTableWidget):
                      for field in dbs.get_fields(COLLECTION_CURRENT)}
         tag_types = [tag_types[tag] for tag in tags]
 
-        for scan in scans:
-            for column, current_tag in enumerate(tags):
-
-                idx += 1
-                self.progress.setValue(idx)
-                QApplication.processEvents()
+        # Names of all the displayed bricks, fetched in one query
+        if TAG_BRICKS in tags:
+            bricks_names = self.get_bricks_names(
+                scan[TAG_BRICKS] for scan in scans)
+        else:
+            bricks_names = {}
 
+        def fill_row(row, scan):
+            """Fill the cells of a row with the values of a scan."""
+            for column, current_tag in enumerate(tags):
                 item = QTableWidgetItem()
 
                 if column == 0:
@@ -1469,32 +1666,9 @@ class TableDataBrowser(QTableWidget):
                                 item, current_value,
                                 col_type)
                         else:
-                            # Tag bricks, display list with buttons
-                            # Initialization of a widget, it is necessary
-                            # to remove it after a sort
-                            #current_value = eval(current_value)
-                            widget = QWidget()
-                            widget.moveToThread(
-                                QApplication.instance().thread())
-                            layout = QVBoxLayout()
-                            for brick_number in range(0, len(current_value)):
-                                brick_uuid = current_value[brick_number]
-
-                                brick_name = self.project.session.get_value(
-                                    COLLECTION_BRICK, brick_uuid, BRICK_NAME)
-                                if brick_name:
-                                    brick_name_button = QPushButton(brick_name)
-                                    brick_name_button.moveToThread(
-                                        QApplication.instance().thread())
-                                    self.bricks[brick_name_button] = brick_uuid
-                                    brick_name_button.clicked.connect(
-                                        self.show_brick_history)
-                                    brick_name_button.clicked.connect(
-                                        partial(self.show_data_history,
-                                                scan['FileName']))
-                                    layout.addWidget(brick_name_button)
-                            widget.setLayout(layout)
-                            self.setCellWidget(row, column, widget)
+                            # Tag bricks, painted by the delegate
+                            self.set_bricks_item(item, current_value,
+                                                 bricks_names)
 
                     # The scan does not have a value for the tag
                     else:
@@ -1507,17 +1681,41 @@ class TableDataBrowser(QTableWidget):
                             item.setFont(font)
                         else:
                             # The scan does not have a brick
-                            # Remove previous initialization of QWidget in cell
-                            self.setCellWidget(row, column, None)
                             set_item_data(item, "", FIELD_TYPE_STRING)
                             item.setFlags(item.flags() & ~Qt.ItemIsEditable)
                             # bricks not editable
 
                 self.setItem(row, column, item)
 
+        if deferred and len(scans) > self.first_page_rows:
+            # First page filled now, the other rows only get their name
+            self.setSortingEnabled(False)
 
+            for row, scan in enumerate(scans):
 
-            row += 1
+                if row < self.first_page_rows:
+                    fill_row(row, scan)
+
+                else:
+                    item = QTableWidgetItem()
+                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                    set_item_data(item, scan[primary_key], FIELD_TYPE_STRING)
+                    self.setItem(row, 0, item)
+
+            self.pending_fill = [fill_row, scans, self.first_page_rows]
+            self.fill_timer.start(0)
+            self.itemChanged.connect(self.change_cell_color)
+            return
+
+        filled = self.fill_rows_by_chunks(
+            scans, fill_row, "Please wait while the cells are being filled...",
+            "Filling the cells")
+
+        if filled < len(scans):
+            # Fill cancelled, only the filled rows are kept
+            self.setRowCount(filled)
+            self.scans_to_visualize = [scan[primary_key]
+                                       for scan in scans[:filled]]
 
         # We apply the saved sort when the project is opened or after the
         # tab is changed
@@ -1540,7 +1738,118 @@ class TableDataBrowser(QTableWidget):
         self.resizeRowsToContents()
         self.resizeColumnsToContents()
 
+    def fill_next_chunk(self, complete=False):
+        """Fill the next rows of a deferred fill (see
+        fill_cells_update_table).
+
+        The rows are filled until fill_time_budget is spent, then the next
+        chunk is scheduled. After the last row, the saved sort and the colors
+        are applied and fill_finished is emitted.
+
+        :param complete: if True, all the remaining rows are filled
+        """
+
+        if self.pending_fill is None:
+            return
+
+        fill_row, scans, row = self.pending_fill
+        chunk_start = time.perf_counter()
+        blocked = self.blockSignals(True)
+
+        while row < len(scans):
+            fill_row(row, scans[row])
+            row += 1
+
+            if (not complete and
+                    time.perf_counter() - chunk_start > self.fill_time_budget):
+                break
+
+        if row < len(scans):
+            self.blockSignals(blocked)
+            self.pending_fill[2] = row
+            self.fill_timer.start(0)
+            return
+
+        self.pending_fill = None
+
+        # Saved sort applied without going through sort_updated
+        tag_to_sort = self.project.getSortedTag()
+        column_to_sort = self.get_tag_column(tag_to_sort)
+        header = self.horizontalHeader()
+        header_blocked = header.blockSignals(True)
+
+        if column_to_sort is not None:
+            header.setSortIndicator(column_to_sort,
+                                    self.project.getSortOrder())
+        else:
+            header.setSortIndicator(0, 0)
+
+        self.setSortingEnabled(True)
+        header.blockSignals(header_blocked)
+
+        self.mark_dirty(scans=(scan[TAG_FILENAME]
+                               for scan in scans[self.first_page_rows:]))
+        self.update_colors()
+        self.blockSignals(blocked)
+        self.resizeRowsToContents()
+        self.resizeColumnsToContents()
+        self.fill_finished.emit()
+
+    def fill_rows_by_chunks(self, rows, fill_row, label, title):
+        """Fill rows of the table by time-sliced chunks.
+
+        The rows are filled until fill_time_budget is spent, then the
+        progress dialog is updated and the pending events are processed
+        before filling the next chunk. The fill stops when the progress
+        dialog is cancelled.
+
+        :param rows: list of the rows to fill
+        :param fill_row: function filling a row, called with the index of
+           the row in rows and the row
+        :param label: label of the progress dialog
+        :param title: window title of the progress dialog
+        :return: the number of filled rows (lower than the number of rows if
+           the fill was cancelled)
+        """
+
+        self.progress = QProgressDialog(label, "Cancel", 0, len(rows))
+        self.progress.setMinimumDuration(0)
+        self.progress.setValue(0)
+        self.progress.setMinimumWidth(350) # For mac OS
+        self.progress.setWindowTitle(title)
+        self.progress.setWindowFlags(Qt.Window | Qt.WindowTitleHint |
+                                     Qt.CustomizeWindowHint)
+        self.progress.setModal(True)
+        self.progress.setAttribute(Qt.WA_DeleteOnClose, True)
+        self.progress.show()
+
+        filled = len(rows)
+        chunk_start = time.perf_counter()
+
+        for idx, row in enumerate(rows):
+            fill_row(idx, row)
+
+            if time.perf_counter() - chunk_start > self.fill_time_budget:
+                # End of the chunk, the event loop can run
+                self.progress.setValue(idx + 1)
+                QApplication.processEvents()
+
+                if self.progress.wasCanceled():
+                    filled = idx + 1
+                    break
+
+                chunk_start = time.perf_counter()
+
         self.progress.close()
+        return filled
+
+    def finish_fill(self):
+        """Fill synchronously the rows left by a deferred fill, before the
+        table is read or modified."""
+
+        if self.pending_fill is not None:
+            self.fill_timer.stop()
+            self.fill_next_chunk(complete=True)
 
     def fill_headers(self, take_tags_to_update=False):
         """Initialize and fill the headers of the table.
@@ -1604,6 +1913,27 @@ class TableDataBrowser(QTableWidget):
             self.setHorizontalHeaderItem(column, item)
             column += 1
 
+    def get_bricks_names(self, bricks_lists):
+        """Fetch the names of bricks in a single database query.
+
+        :param bricks_lists: iterable of lists of brick uuids (None values
+           are ignored)
+        :return: dictionary {brick uuid: brick name}
+        """
+
+        brick_uuids = set()
+        for bricks in bricks_lists:
+            if bricks:
+                brick_uuids.update(bricks)
+
+        if not brick_uuids:
+            return {}
+
+        docs = self.project.session.get_documents(
+            COLLECTION_BRICK, document_ids=list(brick_uuids),
+            fields=[BRICK_ID, BRICK_NAME], as_list=True)
+        return {doc[0]: doc[1] for doc in docs if doc and doc[0] is not None}
+
     def get_current_filter(self):
         """Get the current data browser selection (list of paths).
 
@@ -1624,6 +1954,29 @@ class TableDataBrowser(QTableWidget):
             return_list = self.scans_to_visualize
         return return_list
 
+    def get_documents_by_name(self, collection, scans):
+        """Get the documents of the given scans in a single query.
+
+        :param collection: collection of the documents
+        :param scans: iterable of scan filenames
+        :return: dictionary {scan filename: document}
+        """
+
+        scans = list(scans)
+
+        if not scans:
+            return {}
+
+        dbs = self.project.session
+        primary_key = dbs.get_collection(collection).primary_key
+        req = '%s IN [%s]' % (primary_key,
+                              ', '.join(['"%s"' % x.
+                                         replace('\\', '\\\\').
+                                         replace('"', '\"')
+                                         for x in scans]))
+        return {doc[primary_key]: doc
+                for doc in dbs.filter_documents(collection, req)}
+
     def get_index_insertion(self, to_insert):
         """Get index insertion of a new column, since it's already sorted in
         alphabetical order.
@@ -1663,6 +2016,18 @@ class TableDataBrowser(QTableWidget):
             if tag_name == tag:
                 return column
 
+    def mark_dirty(self, cells=(), scans=(), tags=()):
+        """Record the cells that must be recolored by the next update_colors.
+
+        :param cells: iterable of modified (scan, tag) cells
+        :param scans: iterable of scans whose whole row is modified
+        :param tags: iterable of tags whose whole column is modified
+        """
+
+        self.dirty_cells.update(cells)
+        self.dirty_scans.update(scans)
+        self.dirty_tags.update(tags)
+
     def mouseReleaseEvent(self, e):
         """Update table after mouse release.
 
@@ -1775,6 +2140,8 @@ class TableDataBrowser(QTableWidget):
                     self.setItem(
                         self.coordinates[i][0],
                         self.coordinates[i][1], new_item)
+                    self.mark_dirty(cells=[(self.scans_list[i],
+                                            self.tags[i])])
 
                 # For history
                 history_maker.append(modified_values)
@@ -1800,6 +2167,8 @@ class TableDataBrowser(QTableWidget):
         :param order: "Ascending" or "Descending"
         """
 
+        self.finish_fill()
+
         self.itemChanged.disconnect()
 
         list_tags_name = list_tags
@@ -1827,6 +2196,7 @@ class TableDataBrowser(QTableWidget):
                 list_sort, self.scans_to_visualize))]
 
         # Table updated
+        self.release_bricks_buttons()
         self.setSortingEnabled(False)
         for row in range(0, self.rowCount()):
             scan = self.scans_to_visualize[row]
@@ -1849,10 +2219,64 @@ class TableDataBrowser(QTableWidget):
         self.pop_up = PopUpMultipleSort(self.project, self)
         self.pop_up.show()
 
+    def release_bricks_buttons(self):
+        """Remove the buttons built for the hovered cell of the Bricks
+        column, the delegate paints it again."""
+
+        if self.bricks_buttons_cell is not None:
+            self.removeCellWidget(*self.bricks_buttons_cell)
+            self.bricks_buttons_cell = None
+
+    def reset_colors(self):
+        """Forget the colored cells, the next update_colors recolors the
+        whole table."""
+
+        self.colored_parity = {}
+        self.colored_tags = set()
+        self.dirty_cells = set()
+        self.dirty_scans = set()
+        self.dirty_tags = set()
+
+    def remove_rows(self, scans):
+        """Remove the rows of scans from the table.
+
+        The rows are removed from the model by contiguous ranges, starting
+        from the bottom of the table.
+
+        :param scans: scans whose rows are removed
+        """
+
+        self.finish_fill()
+
+        scans = set(scans)
+        rows = [row for row in range(self.rowCount())
+                if self.item(row, 0) is not None and
+                self.item(row, 0).text() in scans]
+        self.scans_to_visualize[:] = [scan for scan in self.scans_to_visualize
+                                      if scan not in scans]
+        self.release_bricks_buttons()
+        end = len(rows)
+
+        while end > 0:
+            start = end - 1
+
+            while start > 0 and rows[start - 1] == rows[start] - 1:
+                start -= 1
+
+            self.model().removeRows(rows[start], end - start)
+            end = start
+
     def remove_scan(self):
-        """Remove documents from table and project."""
+        """Remove documents from table and project.
 
-        points = self.selectedIndexes()
+        The documents of the selected rows are read with one query per
+        collection, removed in bulk and their rows are removed with
+        remove_rows.
+        """
+
+        # Selected scans, each row only once
+        rows = sorted({point.row() for point in self.selectedIndexes()})
+        scans = [self.item(row, 0).text() for row in rows]
 
         # history_maker = []
         # history_maker.append("remove_scans")
@@ -1862,11 +2286,14 @@ class TableDataBrowser(QTableWidget):
         repeat_pop_up = False
         cancel = False
 
-        for point in points:
-            row = point.row()
-            scan_path = self.item(row, 0).text()
-            scan_object = self.project.session.get_document(
-                                                  COLLECTION_CURRENT, scan_path)
+        documents = self.get_documents_by_name(COLLECTION_CURRENT, scans)
+        documents_init = self.get_documents_by_name(COLLECTION_INITIAL, scans)
+        tags = [tag for tag in self.project.session.get_fields_names(
+                                                            COLLECTION_CURRENT)
+                if tag != TAG_FILENAME]
+
+        for scan_path in scans:
+            scan_object = documents.get(scan_path)
 
             if scan_object is not None:
     
@@ -1874,7 +2301,7 @@ class TableDataBrowser(QTableWidget):
                       (self.data_browser.data_sent is True)):
 
                     if not repeat_pop_up:
-                        self.pop = PopUpRemoveScan(scan_path, len(points))
+                        self.pop = PopUpRemoveScan(scan_path, len(scans))
                         self.pop.exec()
                         cancel = self.pop.stop
                         repeat_pop_up = self.pop.repeat
@@ -1885,31 +2312,19 @@ class TableDataBrowser(QTableWidget):
                 scans_removed.append(scan_object)
 
                 # Adding removed values to history
-                for tag in self.project.session.get_fields_names(
-                        COLLECTION_CURRENT):
-
-                    if tag != TAG_FILENAME:
-                        current_value = self.project.session.get_value(
-                                                             COLLECTION_CURRENT,
-                                                             scan_path,
-                                                             tag)
-                        initial_value = self.project.session.get_value(
-                                                             COLLECTION_INITIAL,
-                                                             scan_path,
-                                                             tag)
-
-                        if ((current_value is not None) or
-                              (initial_value is not None)):
-                            values_removed.append([scan_path,
-                                                   tag,
-                                                   current_value,
-                                                   initial_value])
-
-                self.scans_to_visualize.remove(scan_path)
-                self.project.session.remove_document(
-                    COLLECTION_CURRENT, scan_path)
-                self.project.session.remove_document(
-                    COLLECTION_INITIAL, scan_path)
+                scan_init = documents_init.get(scan_path)
+
+                for tag in tags:
+                    current_value = scan_object[tag]
+                    initial_value = (scan_init[tag] if scan_init is not None
+                                     else None)
+
+                    if ((current_value is not None) or
+                          (initial_value is not None)):
+                        values_removed.append([scan_path,
+                                               tag,
+                                               current_value,
+                                               initial_value])
 
                 full_scan_paths = [os.path.join(self.project.folder, scan_path)]
 
@@ -1921,9 +2336,15 @@ class TableDataBrowser(QTableWidget):
                     if os.path.isfile(full_scan_path):
                         os.remove(full_scan_path)
 
-        for scan in scans_removed:
-            scan_name = getattr(scan, TAG_FILENAME)
-            self.removeRow(self.get_scan_row(scan_name))
+        if scans_removed:
+            names_removed = {getattr(scan, TAG_FILENAME)
+                             for scan in scans_removed}
+            self.project.session.remove_documents_bulk(COLLECTION_CURRENT,
+                                                       names_removed)
+            self.project.session.remove_documents_bulk(
+                COLLECTION_INITIAL,
+                [name for name in names_removed if name in documents_init])
+            self.remove_rows(names_removed)
             self.project.unsavedModifications = True
 
         # history_maker.append(scans_removed)
@@ -1963,6 +2384,7 @@ class TableDataBrowser(QTableWidget):
                     set_item_data(self.item(row, col), initial_value,
                                   self.project.session.get_field(
                                       COLLECTION_CURRENT, tag_name).field_type)
+                    self.mark_dirty(cells=[(scan_name, tag_name)])
                     # For history
                     modified_values.append(
                         [scan_name, tag_name, current_value, initial_value])
@@ -2015,6 +2437,7 @@ class TableDataBrowser(QTableWidget):
                                       self.project.session.get_field(
                                           COLLECTION_CURRENT,
                                           tag_name).field_type)
+                        self.mark_dirty(cells=[(scan, tag_name)])
                         # For history
                         modified_values.append(
                             [scan, tag_name, current_value, initial_value])
@@ -2069,6 +2492,7 @@ class TableDataBrowser(QTableWidget):
                         set_item_data(self.item(row, column), initial_value,
                                       self.project.session.get_field(
                                           COLLECTION_CURRENT, tag).field_type)
+                        self.mark_dirty(cells=[(scan_name, tag)])
                         # For history
                         modified_values.append(
                             [scan_name, tag, current_value, initial_value])
@@ -2167,15 +2591,75 @@ class TableDataBrowser(QTableWidget):
         if self.link_viewer:
             self.data_browser.connect_mini_viewer()
 
-    def show_brick_history(self):
-        """Show brick history pop-up."""
+    def set_bricks_item(self, item, bricks, bricks_names):
+        """Fill an item of the Bricks column.
+
+        The (uuid, name) pairs are stored in the item, the BricksDelegate
+        paints them and show_bricks_buttons builds the buttons on hover.
+
+        :param item: QTableWidgetItem of the Bricks column
+        :param bricks: list of brick uuids of the document
+        :param bricks_names: dictionary {brick uuid: brick name}, as
+           returned by get_bricks_names
+        """
+
+        set_item_data(item, "", FIELD_TYPE_STRING)
+        item.setData(BRICKS_ROLE, [(brick_uuid, bricks_names[brick_uuid])
+                                   for brick_uuid in bricks
+                                   if bricks_names.get(brick_uuid)])
+        # bricks not editable
+        item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+
+    def show_brick_history(self, brick_uuid):
+        """Show brick history pop-up.
+
+        :param brick_uuid: uuid of the brick to display
+        """
 
-        brick_uuid = self.bricks[self.sender()]
         self.show_brick_popup = PopUpShowBrick(
             self.project, brick_uuid, self.data_browser,
             self.data_browser.parent)
         self.show_brick_popup.show()
 
+    def show_bricks_buttons(self, row, column):
+        """Build the buttons of a cell of the Bricks column when it is
+        hovered.
+
+        Only one cell has its buttons built at a time, the other ones are
+        painted by the BricksDelegate.
+
+        :param row: row of the hovered cell
+        :param column: column of the hovered cell
+        """
+
+        if self.bricks_buttons_cell == (row, column):
+            return
+
+        self.release_bricks_buttons()
+        item = self.item(row, column)
+
+        if item is None or not item.data(BRICKS_ROLE):
+            return
+
+        scan = self.item(row, 0).text()
+        widget = QWidget()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(BricksDelegate.margin, BricksDelegate.margin,
+                                  BricksDelegate.margin, BricksDelegate.margin)
+        layout.setSpacing(BricksDelegate.spacing)
+
+        for brick_uuid, brick_name in item.data(BRICKS_ROLE):
+            brick_name_button = QPushButton(brick_name)
+            brick_name_button.clicked.connect(
+                partial(self.show_brick_history, brick_uuid))
+            brick_name_button.clicked.connect(
+                partial(self.show_data_history, scan))
+            layout.addWidget(brick_name_button)
+
+        widget.setLayout(layout)
+        self.setCellWidget(row, column, widget)
+        self.bricks_buttons_cell = (row, column)
+
     def show_data_history(self, scan):
         """Show data history in a separate window."""
         print('show_data_history:', scan)
@@ -2213,6 +2697,7 @@ class TableDataBrowser(QTableWidget):
         self.itemChanged.disconnect()
 
         if column != -1:
+            self.release_bricks_buttons()
             self.project.setSortOrder(int(order))
             self.project.setSortedTag(self.horizontalHeaderItem(column).text())
             self.sortItems(column, order)
@@ -2221,110 +2706,169 @@ class TableDataBrowser(QTableWidget):
 
         self.itemChanged.connect(self.change_cell_color)
 
-    def update_colors(self):
-        """Update the background of all the cells."""
-
-        # itemChanged signal is always disconnected when calling this method
+    def update_cells(self, values):
+        """Update the items of cells whose database values were modified.
 
-        tags = [self.horizontalHeaderItem(column).text()
-                for column in range(len(self.horizontalHeader()))]
-        scans = [self.item(row, 0).text() if self.item(row, 0) else None
-                 for row in range(self.rowCount())]
+        :param values: dictionary {scan: {tag: new database value}}, the None
+           values are displayed as not defined
+        """
 
-        dbs = self.project.session
-        collection_row = dbs.get_collection(COLLECTION_CURRENT)
-        primary_key = collection_row.primary_key
-        collection_init = dbs.get_collection(COLLECTION_INITIAL)
-        primary_key_init = collection_row.primary_key
-        if scans:
-            req = '%s IN [%s]' % (primary_key,
-                                  ', '.join(['"%s"' % x.
-                                             replace('\\', '\\\\').
-                                             replace('"', '\"')
-                                             for x in self.scans_to_visualize]))
-            documents = dbs.filter_documents(COLLECTION_CURRENT, req)
-            documents_init = dbs.filter_documents(COLLECTION_INITIAL, req)
+        self.finish_fill()
 
+        table_scans = {self.item(row, 0).text(): row
+                       for row in range(self.rowCount())
+                       if self.item(row, 0) is not None}
+        table_tags = {self.horizontalHeaderItem(column).text(): column
+                      for column in range(self.columnCount())}
+        tag_types = {field.field_name: field.field_type
+                     for field in self.project.session.get_fields(
+                                                           COLLECTION_CURRENT)}
+
+        # Names of the bricks of the updated scans, fetched in one query
+        if TAG_BRICKS in table_tags:
+            bricks_names = self.get_bricks_names(
+                scan_values.get(TAG_BRICKS)
+                for scan_values in values.values())
         else:
-            documents = []
-            documents_init = []
+            bricks_names = {}
 
-        fields = {f.field_name: f for f in dbs.get_fields(COLLECTION_CURRENT)}
+        for scan, scan_values in values.items():
+            row = table_scans.get(scan)
 
-        table_scans = {self.item(row, 0).text(): row
-                       for row in range(self.rowCount())}
-        table_tags = {self.horizontalHeaderItem(column).text(): column
-                       for column in range(self.columnCount())}
-        table_tags = [table_tags[tag] for tag in tags]
+            if row is None:
+                continue
 
-        # count visible rows odd/even
-        row_even = []
-        even = True
-        for ro in range(self.rowCount()):
-            row_even.append(even)
-            if not self.isRowHidden(ro):
-                even = not even
+            for tag, value in scan_values.items():
+                column = table_tags.get(tag)
+                item = self.item(row, column) if column is not None else None
 
-        for scan_row, scan_i in enumerate(zip(documents, documents_init)):
-            scan, scan_init = scan_i
+                if item is None:
+                    continue
 
-            try:
-                row = table_scans[scan[tags[0]]]
+                if tag == TAG_BRICKS:
+                    # Tag bricks, painted by the delegate
+                    self.set_bricks_item(item, value or [], bricks_names)
+                    self.mark_dirty(cells=[(scan, tag)])
+                    continue
 
-            except KeyError:
-                break
+                font = item.font()
 
-            except Exception as e:
-                print('\nAn unexpected exception was raised when updating the '
-                      'DataBrowser. DataBrowser could be in a degraded display '
-                      'state...!\nTraceback:')
-                print(''.join(traceback.format_tb(e.__traceback__)), end='')
-                print('{0}: {1}\n'.format(e.__class__.__name__, e))
-                break
+                if value is None:
+                    set_item_data(item, not_defined_value, FIELD_TYPE_STRING)
+                    font.setItalic(True)
+                    font.setBold(True)
+                else:
+                    set_item_data(item, value, tag_types[tag])
+                    font.setItalic(False)
+                    font.setBold(False)
 
-            if not self.isRowHidden(row):
-                even = row_even[row]
-
-                for column, tag in zip(table_tags, tags):
-                    if not self.isColumnHidden(column):
-                        item = self.item(row, column)
-
-                        color = QColor()
-
-                        if column == 0:
-                            if even:
-                                color.setRgb(255, 255, 255)  # White
-                            else:
-                                color.setRgb(230, 230, 230)  # Grey
-                        # Avoid issues after switching tab and not saving
-                        elif scan[tag] is None:
-                            if even:
-                                color.setRgb(245, 215, 215)  # Pink
-                            else:
-                                color.setRgb(245, 175, 175)  # Red
-                        # Raw tag
-                        elif fields[tag].origin == TAG_ORIGIN_BUILTIN:
-                            current_value = scan[tag]
-                            initial_value = scan_init[tag]
-                            if current_value != initial_value:
-                                if even:
-                                    color.setRgb(200, 230, 245)  # Cyan
-                                else:
-                                    color.setRgb(150, 215, 230)  # Blue
-                            else:
-                                if even:
-                                    color.setRgb(255, 255, 255)  # White
-                                else:
-                                    color.setRgb(230, 230, 230)  # Grey
-
-                        # User tag
+                item.setFont(font)
+                self.mark_dirty(cells=[(scan, tag)])
+
+    def update_colors(self):
+        """Update the background of the cells that need it.
+
+        Only the dirty cells are recolored: the cells marked by mark_dirty
+        after a write, the rows whose visibility or odd/even position changed
+        and the columns that became visible. A full recolor only happens
+        after reset_colors (project switch or cells recreated).
+        """
+
+        # itemChanged signal is always disconnected when calling this method
+
+        table_scans = {}  # Visible scans: row
+        parity = {}  # Visible scans: even flag
+        even = True
+        for row in range(self.rowCount()):
+            if self.isRowHidden(row) or self.item(row, 0) is None:
+                continue
+            scan = self.item(row, 0).text()
+            table_scans[scan] = row
+            parity[scan] = even
+            even = not even
+
+        table_tags = {}  # Visible tags: column
+        for column in range(self.columnCount()):
+            if not self.isColumnHidden(column):
+                table_tags[self.horizontalHeaderItem(column).text()] = column
+
+        # Whole rows to recolor: new, moved or shown rows
+        dirty_scans = {scan for scan, even in parity.items()
+                       if self.colored_parity.get(scan) != even}
+        dirty_scans.update(scan for scan in self.dirty_scans
+                           if scan in table_scans)
+        # Whole columns to recolor: new or shown columns
+        dirty_tags = set(table_tags).difference(self.colored_tags)
+        dirty_tags.update(tag for tag in self.dirty_tags if tag in table_tags)
+
+        cells = set()
+        for scan in dirty_scans:
+            cells.update((scan, tag) for tag in table_tags)
+        for tag in dirty_tags:
+            cells.update((scan, tag) for scan in table_scans)
+        cells.update(cell for cell in self.dirty_cells
+                     if cell[0] in table_scans and cell[1] in table_tags)
+
+        self.colored_parity = parity
+        self.colored_tags = set(table_tags)
+        self.dirty_cells = set()
+        self.dirty_scans = set()
+        self.dirty_tags = set()
+
+        if cells:
+            scans = {cell[0] for cell in cells}
+            documents = self.get_documents_by_name(COLLECTION_CURRENT, scans)
+            documents_init = self.get_documents_by_name(COLLECTION_INITIAL,
+                                                         scans)
+            fields = {f.field_name: f for f in
+                      self.project.session.get_fields(COLLECTION_CURRENT)}
+
+            for scan, tag in cells:
+                item = self.item(table_scans[scan], table_tags[tag])
+                scan_doc = documents.get(scan)
+
+                if item is None or scan_doc is None:
+                    continue
+
+                scan_init = documents_init.get(scan)
+                even = parity[scan]
+                color = QColor()
+
+                if table_tags[tag] == 0:
+                    if even:
+                        color.setRgb(255, 255, 255)  # White
+                    else:
+                        color.setRgb(230, 230, 230)  # Grey
+                # Avoid issues after switching tab and not saving
+                elif scan_doc[tag] is None:
+                    if even:
+                        color.setRgb(245, 215, 215)  # Pink
+                    else:
+                        color.setRgb(245, 175, 175)  # Red
+                # Raw tag
+                elif fields[tag].origin == TAG_ORIGIN_BUILTIN:
+                    current_value = scan_doc[tag]
+                    initial_value = (scan_init[tag] if scan_init is not None
+                                     else None)
+                    if current_value != initial_value:
+                        if even:
+                            color.setRgb(200, 230, 245)  # Cyan
                         else:
-                            if even:
-                                color.setRgb(245, 215, 215)  # Pink
-                            else:
-                                color.setRgb(245, 175, 175)  # Red
+                            color.setRgb(150, 215, 230)  # Blue
+                    else:
+                        if even:
+                            color.setRgb(255, 255, 255)  # White
+                        else:
+                            color.setRgb(230, 230, 230)  # Grey
+
+                # User tag
+                else:
+                    if even:
+                        color.setRgb(245, 215, 215)  # Pink
+                    else:
+                        color.setRgb(245, 175, 175)  # Red
 
-                        item.setData(Qt.BackgroundRole, QtCore.QVariant(color))
+                item.setData(Qt.BackgroundRole, QtCore.QVariant(color))
 
         # Auto-save
         config = Config()
@@ -2334,6 +2878,8 @@ class TableDataBrowser(QTableWidget):
     def update_selection(self):
         """Update the selection after a search."""
 
+        self.finish_fill()
+
         # Selection updated
         self.clearSelection()
 
@@ -2347,14 +2893,19 @@ class TableDataBrowser(QTableWidget):
                     item_to_select = self.item(row, self.get_tag_column(tag))
                     item_to_select.setSelected(True)
 
-    def update_table(self, take_tags_to_update=False):
+    def update_table(self, take_tags_to_update=False, deferred=False):
         """Fill the table with the project's data.
 
         Only called when switching project to completely reset the table.
 
         :param take_tags_to_update: boolean
+        :param deferred: if True, only the first page of rows is filled
+           before returning (see fill_cells_update_table)
         """
 
+        # A deferred fill of the previous content is abandoned
+        self.pending_fill = None
+        self.fill_timer.stop()
         self.setSortingEnabled(False)
         self.clearSelection()  # Selection cleared when switching project
         # The list of scans to visualize
@@ -2373,13 +2924,15 @@ class TableDataBrowser(QTableWidget):
         # Sort visual management
         self.fill_headers(take_tags_to_update)
         # Cells filled
-        self.fill_cells_update_table()
+        self.fill_cells_update_table(deferred)
 
         self.itemChanged.disconnect()
 
-        # Columns and rows resized
-        self.resizeColumnsToContents()
-        self.resizeRowsToContents()
+        # Columns and rows resized (at the end of a deferred fill)
+        if self.pending_fill is None:
+            self.resizeColumnsToContents()
+            self.resizeRowsToContents()
+
         self.update_colors()
 
         # When the user changes one item of the table, the background
@@ -2393,6 +2946,8 @@ class TableDataBrowser(QTableWidget):
         :param showed: list of tags to display
         """
 
+        self.finish_fill()
+
         self.itemChanged.disconnect()
         if self.activate_selection:
             self.itemSelectionChanged.disconnect()
@@ -2433,6 +2988,9 @@ class TableDataBrowser(QTableWidget):
 
         :param old_scans: old list of scans
         """
+
+        self.finish_fill()
+
         self.itemChanged.disconnect()
 
         if self.activate_selection:
@@ -54,6 +54,7 @@ from populse_mia.user_interface.pop_ups import (PopUpDeleteProject,
                                                 PopUpSaveProjectAs,
                                                 PopUpQuit,
                                                 PopUpSeeAllProjects)
+from populse_mia.utils.utils import StageTimer
 from populse_mia.user_interface.data_viewer.data_viewer_tab import (
     DataViewerTab)
 import threading
@@ -127,6 +128,7 @@ class MainWindow(QMainWindow):
           the recent projects
         - open_recent_project: open a recent project
         - package_library_pop_up: open the package library pop-up
+        - project_loaded: report the opening time once the table is filled
         - project_properties_pop_up: open the project properties pop-up
         - redo: redo the last action made by the user
         - remove_raw_files_useless: remove the useless raw files of the
@@ -180,6 +182,13 @@ class MainWindow(QMainWindow):
         self.projectName = "Unnamed project"
         self.project = project
         self.test = test
+        # Stages of the last project opening (see switch_project) and start
+        # of the background fill of its table
+        self.open_timer = None
+        self.open_fill_start = None
+        # Revision of the database displayed by the data browser table, None
+        # while the Data Browser tab is shown (see tab_changed)
+        self.data_browser_revision = None
 
         self.saved_projects = SavedProjects()
         self.saved_projects_list = self.saved_projects.pathsList
@@ -203,6 +212,8 @@ class MainWindow(QMainWindow):
         # Initialize tabs
         self.tabs = QTabWidget()
         self.data_browser = DataBrowser(self.project, self)
+        self.data_browser.table_data.fill_finished.connect(
+            self.project_loaded)
         self.data_viewer = DataViewerTab(self)
         self.pipeline_manager = PipelineManagerTab(self.project, [], self)
         self.centralWindow = QWidget()
@@ -828,6 +839,18 @@ class MainWindow(QMainWindow):
         self.pop_up_package_library.signal_save.connect(
             self.pipeline_manager.processLibrary.update_process_library)
 
+    def project_loaded(self):
+        """Report the opening time of the project once the background fill
+        of the data browser table is over."""
+
+        if self.open_fill_start is None:
+            return
+
+        self.open_timer.add("background fill",
+                            time.perf_counter() - self.open_fill_start)
+        self.open_fill_start = None
+        print(self.open_timer.report())
+
     def project_properties_pop_up(self):
         """Open the project properties pop-up"""
 
@@ -1298,6 +1321,8 @@ class MainWindow(QMainWindow):
 
         # Switching project only if it's a different one
         if file_path != self.project.folder:
+            timer = StageTimer("Opening of the project " +
+                               os.path.basename(file_path))
 
             # If the file exists
             if os.path.exists(os.path.join(file_path)):
@@ -1344,7 +1369,9 @@ class MainWindow(QMainWindow):
 
                     # We check for invalid scans in the project
                     try:
-                        temp_database = Project(file_path, False)
+
+                        with timer.stage("database"):
+                            temp_database = Project(file_path, False)
 
                     except IOError:
                         msg = QMessageBox()
@@ -1392,11 +1419,12 @@ class MainWindow(QMainWindow):
                     config.saveConfig()
 
                     # We remove the useless files from the old project
-                    self.remove_raw_files_useless()
+                    with timer.stage("previous project cleanup"):
+                        self.remove_raw_files_useless()
 
                     self.project = temp_database  # New Database
 
-                    self.update_project(file_path)
+                    self.update_project(file_path, timer=timer)
                     # project updated everywhere
 
                     return True
@@ -1467,23 +1495,37 @@ class MainWindow(QMainWindow):
         if self.tabs.tabText(
                 self.tabs.currentIndex()).replace("&",
                                                   "", 1) == 'Data Browser':
-            # data_browser refreshed after working with pipelines
+            # data_browser refreshed after working with pipelines, with only
+            # the changes made in the database since it was left
             old_scans = self.data_browser.table_data.scans_to_visualize
             documents = self.project.session.get_documents_names(
                 COLLECTION_CURRENT)
 
-            self.data_browser.table_data.add_columns()
-            self.data_browser.table_data.fill_headers()
+            if self.data_browser_revision is None:
+                changes = ((), ())
 
-            self.data_browser.table_data.add_rows(documents)
+            else:
+                changes = self.project.session.get_changes(
+                    COLLECTION_CURRENT, self.data_browser_revision)
 
+            self.data_browser_revision = None
             self.data_browser.table_data.scans_to_visualize = documents
             self.data_browser.table_data.scans_to_search = documents
 
-            self.data_browser.table_data.itemChanged.disconnect()
-            self.data_browser.table_data.fill_cells_update_table()
-            self.data_browser.table_data.itemChanged.connect(
-                self.data_browser.table_data.change_cell_color)
+            if changes is None:
+                # Unknown changes (rollback), the table is rebuilt
+                self.data_browser.table_data.add_columns()
+                self.data_browser.table_data.fill_headers()
+
+                self.data_browser.table_data.add_rows(documents)
+
+                self.data_browser.table_data.itemChanged.disconnect()
+                self.data_browser.table_data.fill_cells_update_table()
+                self.data_browser.table_data.itemChanged.connect(
+                    self.data_browser.table_data.change_cell_color)
+
+            elif changes[0] or changes[1]:
+                self.data_browser.table_data.apply_changes(*changes)
 
             self.data_browser.table_data.update_visualized_rows(old_scans)
 
@@ -1500,7 +1542,12 @@ class MainWindow(QMainWindow):
                 self.data_browser.advanced_search.apply_filter(
                      self.project.currentFilter)
 
-        elif self.tabs.tabText(
+        elif self.data_browser_revision is None:
+            # The Data Browser tab is left, the next changes of the database
+            # will be applied when it is shown again
+            self.data_browser_revision = self.project.session.revision
+
+        if self.tabs.tabText(
                 self.tabs.currentIndex()).replace("&",
                                                   "", 1) == 'Data Viewer':
             self.data_viewer.load_viewer(self.data_viewer.current_viewer())
@@ -1566,22 +1613,48 @@ class MainWindow(QMainWindow):
     #         self.action_package_library.setEnabled(True)
     #         # self.action_install_processes.setEnabled(True)
 
-    def update_project(self, file_path, call_update_table=True):
+    def update_project(self, file_path, call_update_table=True, timer=None):
         """Update the project once the database has been updated.
         Update the database, the window title and the recent and saved
         projects menus.
 
+        Only the first page of the table is filled before returning, the
+        other rows are filled in the background.
+
         :param file_path: File name of the new project
         :param call_update_table: boolean, True if we need to call
+        :param timer: StageTimer measuring the opening of the project, its
+           report is printed when the table is completely filled
         """
 
-        self.data_browser.update_database(self.project)
+        if timer is None:
+            timer = StageTimer("Update of the project")
+            self.open_timer = None
 
-        # Database update data_browser
-        self.pipeline_manager.update_project(self.project)
+        else:
+            self.open_timer = timer
+
+        self.open_fill_start = None
+
+        with timer.stage("schema"):
+            self.data_browser.update_database(self.project)
+
+            # Database update data_browser
+            self.pipeline_manager.update_project(self.project)
 
         if call_update_table:
-            self.data_browser.table_data.update_table()  # Table updated
+
+            with timer.stage("first page"):
+                # Table updated
+                self.data_browser.table_data.update_table(deferred=True)
+
+        if self.tabs.tabText(
+                self.tabs.currentIndex()).replace("&",
+                                                  "", 1) == 'Data Browser':
+            self.data_browser_revision = None
+
+        else:
+            self.data_browser_revision = self.project.session.revision
 
         # Window name updated
         if self.project.isTempProject:
@@ -1596,6 +1669,14 @@ class MainWindow(QMainWindow):
                 file_path)
         self.update_recent_projects_actions()
 
+        if self.open_timer is not None:
+
+            if self.data_browser.table_data.pending_fill is None:
+                print(self.open_timer.report())
+
+            else:
+                self.open_fill_start = time.perf_counter()
+
     def update_recent_projects_actions(self):
         """Update the list of recent projects."""
         for j in range(0, self.config.get_max_projects()):
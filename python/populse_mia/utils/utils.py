@@ -2,6 +2,8 @@
 Module that contains multiple functions used across the software.
 
 :Contains:
+    :Class:
+        - StageTimer
     :Functions:
         - check_value_type
         - message_already_exists
@@ -23,6 +25,8 @@ Module that contains multiple functions used across the software.
 import ast
 import os
 import re
+from time import perf_counter
+from contextlib import contextmanager
 from datetime import datetime, date, time
 import dateutil.parser
 
@@ -41,6 +45,68 @@ from populse_db.database import (
 from populse_mia.software_properties import Config
 
 
+class StageTimer():
+    """Measure the durations of the successive stages of an operation.
+
+    :param name: name of the operation, used in the report
+
+    .. Methods:
+        - add: record a stage measured elsewhere
+        - report: give the durations of the stages as text
+        - stage: context manager measuring a stage
+    """
+
+    def __init__(self, name):
+        """Initialization of the timer.
+
+        :param name: name of the operation
+        """
+
+        self.name = name
+        self.stages = []
+
+    def add(self, name, duration):
+        """Record a stage measured elsewhere.
+
+        :param name: name of the stage
+        :param duration: duration of the stage (s)
+        """
+
+        self.stages.append((name, duration))
+
+    def report(self):
+        """Give the durations of the stages as text.
+
+        :return: the report (str), one line per stage then the total
+        """
+
+        width = max([len(name) for name, duration in self.stages] + [5])
+        lines = ["{0}:".format(self.name)]
+
+        for name, duration in self.stages:
+            lines.append("    {0:<{1}} {2:8.3f} s".format(name, width,
+                                                          duration))
+
+        lines.append("    {0:<{1}} {2:8.3f} s".format(
+            "total", width, sum(duration for name, duration in self.stages)))
+        return "\n".join(lines)
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager measuring the duration of a stage.
+
+        :param name: name of the stage
+        """
+
+        start = perf_counter()
+
+        try:
+            yield
+
+        finally:
+            self.add(name, perf_counter() - start)
+
+
 def check_value_type(value, value_type, is_subvalue=False):
     """
     Checks the type of a new value